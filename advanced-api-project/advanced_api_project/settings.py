@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'advanced_api_project.nplusone.DuplicateQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -123,3 +124,9 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# advanced_api_project.nplusone: 'warn' or 'raise' when one request repeats a query shape
+# more than DUPLICATE_QUERY_THRESHOLD times. The test runner always raises.
+DUPLICATE_QUERY_DETECTION = 'warn' if DEBUG else None
+DUPLICATE_QUERY_THRESHOLD = 2
+TEST_RUNNER = 'advanced_api_project.nplusone.DuplicateQueryTestRunner'
@@ -15,6 +15,7 @@ class Book(models.Model):
         related_name='books',  # enables author.books to list all related books
         on_delete=models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
     
 
     def __str__(self):
@@ -3,7 +3,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth.models import User
 
-from api.models import Book
+from api.models import Author, Book
 
 
 class BookAPITestCase(APITestCase):
@@ -135,3 +135,36 @@ class BookAPITestCase(APITestCase):
         })
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookListETagTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = Author.objects.create(name="Charles Dickens")
+        self.book = Book.objects.create(title="A Tale of Two Cities", publication_year=1859, author=self.author)
+        self.list_url = reverse("book-list")
+
+    def test_matching_etag_returns_304_until_books_change(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Query parameters are part of the ETag.
+        response = self.client.get(self.list_url, {"ordering": "title"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.book.title = "Great Expectations"
+        self.book.save()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["title"], "Great Expectations")
+
+    def test_renaming_the_author_changes_the_etag(self):
+        etag = self.client.get(self.list_url)["ETag"]
+
+        Author.objects.filter(pk=self.author.pk).update(name="Boz")
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -6,11 +6,12 @@ from rest_framework import generics, status, filters
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters import rest_framework 
+from .conditional import ConditionalGetMixin
 from .models import Book, Author
 from .serializers import BookSerializer
 
 
-class BookListView(generics.ListAPIView):
+class BookListView(ConditionalGetMixin, generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     filter_backends = [rest_framework.DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
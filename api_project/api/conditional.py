@@ -0,0 +1,44 @@
+"""
+Conditional GET (ETag / If-None-Match) for BookViewSet.
+
+A book stores its author's name in its own row, so the ETag hashes the
+listed rows' pk, updated_at, title and author, read in one query. That
+also catches edits made with queryset.update(), which leaves updated_at
+alone. A matching request gets a 304 without the books being serialized.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+class ConditionalGetMixin:
+    """Adds ETags to ``list`` and ``retrieve``."""
+    etag_fields = ('pk', 'updated_at', 'title', 'author')
+
+    def get_etag(self, request, queryset):
+        rows = list(queryset.values_list(*self.etag_fields))
+        # The URL covers filters and ordering, the format covers the renderer.
+        key = (request.get_full_path(), request.accepted_renderer.format, rows)
+        return '"%s"' % hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def conditional_response(self, request, queryset, view, *args, **kwargs):
+        etag = self.get_etag(request, queryset)
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(request, queryset, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(request, queryset, super().retrieve, *args, **kwargs)
@@ -3,4 +3,5 @@ from django.db import models
 # Create your models here.
 class Book (models.Model):
     title = models.CharField(max_length=100)
-    author = models.CharField(max_length=100)
\ No newline at end of file
+    author = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
\ No newline at end of file
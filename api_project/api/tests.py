@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .models import Book
+
+
+class BookETagTestCase(APITestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(title="Dune", author="Frank Herbert")
+        self.client.force_authenticate(User.objects.create_user(username="reader", password="password123"))
+        self.list_url = reverse("book_all-list")
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(self.list_url)["ETag"]
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_renaming_the_author_changes_the_etag(self):
+        etag = self.client.get(self.list_url)["ETag"]
+
+        Book.objects.filter(pk=self.book.pk).update(author="F. Herbert")
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["author"], "F. Herbert")
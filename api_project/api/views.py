@@ -5,6 +5,7 @@ from rest_framework import generics, viewsets
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 
+from .conditional import ConditionalGetMixin
 from .models import Book
 from .serializers import BookSerializer
 
@@ -15,7 +16,7 @@ class BookList(generics.ListAPIView):
 
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
 
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django_blog.nplusone.DuplicateQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -127,3 +128,9 @@ STATICFILES_DIRS = [BASE_DIR /"static"]
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# django_blog.nplusone: 'warn' or 'raise' when one request repeats a query shape
+# more than DUPLICATE_QUERY_THRESHOLD times. The test runner always raises.
+DUPLICATE_QUERY_DETECTION = 'warn' if DEBUG else None
+DUPLICATE_QUERY_THRESHOLD = 2
+TEST_RUNNER = 'django_blog.nplusone.DuplicateQueryTestRunner'
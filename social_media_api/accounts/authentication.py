@@ -0,0 +1,168 @@
+"""
+Token authentication that resolves the Authorization header without touching
+the database on the hot path.
+
+Lookups go through two tiers: a small LRU dict in this process, which is
+bounded in size and has a short TTL because other processes cannot
+invalidate it, and then the shared Django cache. Entries are dropped when
+the token is deleted or rotated and when its user is saved or deactivated
+(see accounts.signals).
+
+Neither tier holds secrets: an entry is the user's columns without the
+password hash plus the token's creation time, stored under a hash of the
+key. Each request gets a User rebuilt from it with ``password`` deferred
+(so saving it never overwrites the hash) and a Token rebuilt from the key
+it presented.
+
+``aauthenticate`` does the same lookups with the async cache and ORM APIs
+for the plain async views (social_media_api.asyncapi).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+
+def cache_key(key):
+    # Never put raw token keys in a shared cache.
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def to_cache_entry(user, token):
+    """The cacheable part of a token's credentials: no password hash, no key."""
+    return {
+        'user': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname != 'password'
+        },
+        'token_created': token.created,
+    }
+
+
+def from_cache_entry(key, entry):
+    """Fresh (user, token) instances for one request from a cache entry."""
+    User = get_user_model()
+    fields = entry['user']
+    user = User.from_db(router.db_for_read(User), list(fields), list(fields.values()))
+    token = Token.from_db(
+        router.db_for_read(Token), ['key', 'user_id', 'created'], [key, user.pk, entry['token_created']],
+    )
+    token.user = user
+    return user, token
+
+
+class LocalTokenCache:
+    """Thread-safe LRU of token key -> cache entry with a per-entry TTL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'TOKEN_AUTH_LOCAL_CACHE_TTL', 5)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_token_cache = LocalTokenCache()
+
+
+def invalidate_token(key):
+    """Forget a token in both tiers."""
+    local_token_cache.delete(key)
+    cache.delete(cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    for key in Token.objects.filter(user=user).values_list('key', flat=True):
+        invalidate_token(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in replacement for rest_framework's TokenAuthentication."""
+
+    def authenticate_credentials(self, key):
+        entry = local_token_cache.get(key)
+        if entry is None:
+            entry = cache.get(cache_key(key))
+            if entry is None:
+                entry = to_cache_entry(*super().authenticate_credentials(key))
+                cache.set(cache_key(key), entry, getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300))
+            local_token_cache.set(key, entry)
+        return self.check_credentials(key, entry)
+
+    def check_credentials(self, key, entry):
+        user, token = from_cache_entry(key, entry)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return user, token
+
+    def get_key(self, request):
+        """The token key from the Authorization header, or None without one."""
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+    async def aauthenticate(self, request):
+        key = self.get_key(request)
+        if key is None:
+            return None
+        entry = local_token_cache.get(key)
+        if entry is None:
+            entry = await cache.aget(cache_key(key))
+            if entry is None:
+                try:
+                    token = await Token.objects.select_related('user').aget(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed('Invalid token.')
+                if not token.user.is_active:
+                    raise exceptions.AuthenticationFailed('User inactive or deleted.')
+                entry = to_cache_entry(token.user, token)
+                await cache.aset(cache_key(key), entry, getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300))
+            local_token_cache.set(key, entry)
+        return self.check_credentials(key, entry)
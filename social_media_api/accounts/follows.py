@@ -0,0 +1,129 @@
+"""
+Helpers for the follow graph (the self-referential User.following M2M).
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, router, transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed
+
+from notifications.dispatch import enqueue_many
+
+User = get_user_model()
+Follow = User.following.through
+
+# Follow rows per INSERT statement.
+INSERT_BATCH_SIZE = 500
+
+
+def _count_by(column):
+    rows = Follow.objects.filter(**{column: OuterRef('pk')}).order_by().values(column)
+    return Coalesce(Subquery(rows.annotate(total=Count('*')).values('total')), 0)
+
+
+def recount_follow_counters(user_ids=None):
+    """
+    Reset follower_count and following_count from the through table, for
+    ``user_ids`` or for every user.
+    """
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    return users.update(follower_count=_count_by('to_user'), following_count=_count_by('from_user'))
+
+
+def _send_follow_signals(follower, actions, pk_set):
+    for action in actions:
+        m2m_changed.send(
+            sender=Follow, instance=follower, action=action, reverse=False,
+            model=User, pk_set=pk_set, using=router.db_for_write(Follow),
+        )
+
+
+def insert_follows(follower_id, target_ids):
+    """
+    Insert follows of ``target_ids`` by ``follower_id``, skipping ones that
+    already exist, and return the ids actually followed. The database reports
+    them (INSERT ... ON CONFLICT DO NOTHING RETURNING), so a concurrent
+    request following the same users can't claim the same rows.
+    """
+    table = connection.ops.quote_name(Follow._meta.db_table)
+    from_column = connection.ops.quote_name(Follow._meta.get_field('from_user').column)
+    to_column = connection.ops.quote_name(Follow._meta.get_field('to_user').column)
+    target_ids = sorted(target_ids)
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(target_ids), INSERT_BATCH_SIZE):
+            batch = target_ids[start:start + INSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({from_column}, {to_column}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({from_column}, {to_column}) DO NOTHING "
+                f"RETURNING {to_column}",
+                [value for target_id in batch for value in (follower_id, target_id)],
+            )
+            inserted.update(row[0] for row in cursor.fetchall())
+    return inserted
+
+
+def bulk_follow(follower, target_ids, notify=True):
+    """
+    Make ``follower`` follow every user in ``target_ids``.
+
+    Targets are resolved in one query, the through rows are written with a
+    single bulk insert, and m2m_changed is sent once with every new target
+    so counters and timelines are updated in batch, exactly as
+    ``follower.following.add(*targets)`` would. Only rows this call inserted
+    count as new, so concurrent calls never update counters or notify twice.
+    Returns a dict of the ids that were followed, already followed, or not
+    found.
+    """
+    requested = set(target_ids) - {follower.pk}
+    found = set(User.objects.filter(pk__in=requested).values_list('pk', flat=True))
+    candidates = found - set(
+        Follow.objects.filter(from_user=follower, to_user_id__in=found).values_list('to_user_id', flat=True)
+    )
+
+    new_ids = set()
+    if candidates:
+        with transaction.atomic():
+            _send_follow_signals(follower, ['pre_add'], candidates)
+            new_ids = insert_follows(follower.pk, candidates)
+            if new_ids:
+                _send_follow_signals(follower, ['post_add'], new_ids)
+                if notify:
+                    enqueue_many((target_id, follower.pk, "followed", None) for target_id in new_ids)
+
+    return {
+        'followed': sorted(new_ids),
+        'already_following': sorted(found - new_ids),
+        'not_found': sorted(requested - found),
+    }
+
+
+def bulk_unfollow(follower, target_ids):
+    """Stop following every user in ``target_ids``. Returns the ids unfollowed."""
+    rows = Follow.objects.filter(from_user=follower, to_user_id__in=set(target_ids))
+    removed = set(rows.values_list('to_user_id', flat=True))
+    if removed:
+        with transaction.atomic():
+            _send_follow_signals(follower, ['pre_remove'], removed)
+            Follow.objects.filter(from_user=follower, to_user_id__in=removed).delete()
+            _send_follow_signals(follower, ['post_remove'], removed)
+    return sorted(removed)
+
+
+def relationships(user, user_ids):
+    """
+    Map each id in ``user_ids`` to {'following': bool, 'followed_by': bool}
+    from ``user``'s point of view, using one query over the through table.
+    """
+    user_ids = set(user_ids)
+    rows = Follow.objects.filter(
+        Q(from_user=user, to_user_id__in=user_ids) | Q(from_user_id__in=user_ids, to_user=user)
+    ).values_list('from_user_id', 'to_user_id')
+    result = {user_id: {'following': False, 'followed_by': False} for user_id in user_ids}
+    for from_id, to_id in rows:
+        if from_id == user.pk and to_id in result:
+            result[to_id]['following'] = True
+        if to_id == user.pk and from_id in result:
+            result[from_id]['followed_by'] = True
+    return result
@@ -0,0 +1,213 @@
+"""
+In-memory snapshot of the follow graph for "people you may know" queries.
+
+The snapshot is a pair of CSR (compressed sparse row) adjacency lists, one
+for outgoing and one for incoming follows. Users are mapped to dense row
+numbers; for row ``i`` the neighbours are ``targets[offsets[i]:offsets[i + 1]]``.
+Both arrays are flat ``array('q')`` buffers, so a graph with millions of edges
+takes a few bytes per edge rather than a Python set per user.
+
+Follows made after the snapshot was loaded are applied on commit from
+m2m_changed (see accounts.signals) as small per-user added/removed sets
+that overlay the CSR rows. Once the overlay grows past
+FOLLOW_GRAPH_MAX_DELTA edges it is folded back into fresh arrays. Other
+processes do not see this process's overlay, so a snapshot older than
+FOLLOW_GRAPH_MAX_AGE seconds is reloaded from the database.
+
+Only the first load happens on the request path. A stale snapshot keeps
+serving while one background thread reloads it, and follows applied while
+the edges are being read are replayed onto the new snapshot.
+"""
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from heapq import nsmallest
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+
+User = get_user_model()
+Follow = User.following.through
+
+
+def get_max_delta():
+    return getattr(settings, 'FOLLOW_GRAPH_MAX_DELTA', 10000)
+
+
+def get_max_age():
+    return getattr(settings, 'FOLLOW_GRAPH_MAX_AGE', 300)
+
+
+class CSR:
+    """Read-only adjacency lists for a fixed set of rows."""
+
+    def __init__(self, row_count, edges):
+        """``edges`` is an iterable of (row, target_id) pairs in any order."""
+        degree = array('q', bytes(8 * (row_count + 1)))
+        pairs = list(edges)
+        for row, _ in pairs:
+            degree[row + 1] += 1
+        for i in range(row_count):
+            degree[i + 1] += degree[i]
+        self.offsets = degree
+        self.targets = array('q', bytes(8 * len(pairs)))
+        cursor = array('q', degree[:-1])
+        for row, target in pairs:
+            self.targets[cursor[row]] = target
+            cursor[row] += 1
+
+    def row(self, row):
+        return self.targets[self.offsets[row]:self.offsets[row + 1]]
+
+
+class FollowGraph:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Held for the duration of a load, so only one runs at a time.
+        self._load_lock = threading.Lock()
+        self._loader = None
+        # Changes applied while a load is reading edges, or None.
+        self._pending = None
+        self._loaded_at = None
+        self._reset({}, [])
+
+    def _reset(self, index, edges):
+        self.index = index
+        self.out_edges = CSR(len(index), ((index[a], b) for a, b in edges))
+        self.in_edges = CSR(len(index), ((index[b], a) for a, b in edges))
+        self.added = {'out': defaultdict(set), 'in': defaultdict(set)}
+        self.removed = {'out': defaultdict(set), 'in': defaultdict(set)}
+        self.delta_size = 0
+
+    @property
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def _read_edges(self):
+        return list(Follow.objects.values_list('from_user_id', 'to_user_id').iterator(chunk_size=10000))
+
+    def _load(self):
+        with self._lock:
+            self._pending = []
+        try:
+            edges = self._read_edges()
+        except BaseException:
+            with self._lock:
+                self._pending = None
+            raise
+        user_ids = sorted({user_id for edge in edges for user_id in edge})
+        with self._lock:
+            self._reset({user_id: row for row, user_id in enumerate(user_ids)}, edges)
+            self._loaded_at = time.monotonic()
+            # The read may or may not have seen these; applying them again is
+            # harmless either way.
+            pending, self._pending = self._pending, None
+            for changed, added in pending:
+                self._apply(changed, added)
+
+    def load(self):
+        """Replace the snapshot with the follow graph currently in the database."""
+        with self._load_lock:
+            self._load()
+
+    def _reload(self):
+        try:
+            self._load()
+        finally:
+            self._load_lock.release()
+            connections.close_all()
+
+    def ensure_loaded(self):
+        if self._loaded_at is None:
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self._load()
+        elif time.monotonic() - self._loaded_at > get_max_age() and self._load_lock.acquire(blocking=False):
+            self._loader = threading.Thread(target=self._reload, name='follow-graph-reload', daemon=True)
+            self._loader.start()
+
+    def clear(self):
+        with self._lock:
+            self._reset({}, [])
+            self._loaded_at = None
+
+    def compact(self):
+        """Fold the added/removed overlay back into the CSR arrays."""
+        with self._lock:
+            user_ids = set(self.index) | set(self.added['out']) | set(self.added['in'])
+            edges = [(a, b) for a in user_ids for b in self._neighbours('out', a)]
+            self._reset({user_id: row for row, user_id in enumerate(sorted(user_ids))}, edges)
+
+    def _neighbours(self, direction, user_id):
+        csr = self.out_edges if direction == 'out' else self.in_edges
+        row = self.index.get(user_id)
+        base = set(csr.row(row)) if row is not None else set()
+        return (base - self.removed[direction].get(user_id, set())) | self.added[direction].get(user_id, set())
+
+    def following(self, user_id):
+        with self._lock:
+            return self._neighbours('out', user_id)
+
+    def followers(self, user_id):
+        with self._lock:
+            return self._neighbours('in', user_id)
+
+    def _in_snapshot(self, direction, a, b):
+        row = self.index.get(a)
+        csr = self.out_edges if direction == 'out' else self.in_edges
+        return row is not None and b in csr.row(row)
+
+    def _apply(self, edges, added):
+        edges = list(edges)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((edges, added))
+            if not self.is_loaded:
+                return  # the next load() reads the change from the database
+            for follower_id, followee_id in edges:
+                for direction, a, b in (('out', follower_id, followee_id), ('in', followee_id, follower_id)):
+                    in_snapshot = self._in_snapshot(direction, a, b)
+                    if added:
+                        self.removed[direction][a].discard(b)
+                        if not in_snapshot:
+                            self.added[direction][a].add(b)
+                    else:
+                        self.added[direction][a].discard(b)
+                        if in_snapshot:
+                            self.removed[direction][a].add(b)
+                self.delta_size += 1
+            if self.delta_size > get_max_delta():
+                self.compact()
+
+    def add_edges(self, edges):
+        """Record (follower_id, followee_id) follows made since the snapshot."""
+        self._apply(edges, added=True)
+
+    def remove_edges(self, edges):
+        self._apply(edges, added=False)
+
+    def suggestions(self, user_id, limit=20):
+        """
+        Users followed by the people ``user_id`` follows, excluding
+        ``user_id`` and anyone they already follow, as (user_id, mutual_count)
+        pairs ordered by mutual_count descending.
+        """
+        with self._lock:
+            following = self._neighbours('out', user_id)
+            counts = Counter()
+            for followee_id in following:
+                counts.update(self._neighbours('out', followee_id))
+        for excluded in following | {user_id}:
+            counts.pop(excluded, None)
+        return nsmallest(limit, counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def mutual_followers(self, viewer_id, user_id):
+        """Ids of users ``viewer_id`` follows who also follow ``user_id``."""
+        with self._lock:
+            return sorted(self._neighbours('out', viewer_id) & self._neighbours('in', user_id))
+
+
+follow_graph = FollowGraph()
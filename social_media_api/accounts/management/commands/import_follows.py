@@ -0,0 +1,65 @@
+import csv
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.follows import bulk_follow
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Import follows from a CSV of follower_id,followee_id rows (an optional "
+        "header is skipped) or for a single follower given on the command line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?', help="CSV file with follower_id,followee_id rows.")
+        parser.add_argument('--user', type=int, help="Follower id when importing from --targets.")
+        parser.add_argument('--targets', type=int, nargs='+', default=[], help="User ids to follow.")
+        parser.add_argument('--no-notify', action='store_true',
+                            help="Do not send \"followed\" notifications for imported follows.")
+
+    def handle(self, *args, **options):
+        if options['csv_file']:
+            follows = self.read_csv(options['csv_file'])
+        elif options['user'] and options['targets']:
+            follows = {options['user']: set(options['targets'])}
+        else:
+            raise CommandError("Pass a CSV file, or --user together with --targets.")
+
+        followers = User.objects.in_bulk(follows)
+        missing = sorted(set(follows) - set(followers))
+        if missing:
+            self.stderr.write(f"Skipping unknown follower id(s): {', '.join(map(str, missing))}")
+
+        totals = defaultdict(int)
+        for follower_id, follower in sorted(followers.items()):
+            result = bulk_follow(follower, follows[follower_id], notify=not options['no_notify'])
+            for key, ids in result.items():
+                totals[key] += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Followed {totals['followed']}, already following {totals['already_following']}, "
+            f"unknown targets {totals['not_found']}."
+        ))
+
+    def read_csv(self, path):
+        follows = defaultdict(set)
+        try:
+            with open(path, newline='') as f:
+                for line_number, row in enumerate(csv.reader(f), 1):
+                    if not row:
+                        continue
+                    try:
+                        follower_id, followee_id = (int(value) for value in row[:2])
+                    except ValueError:
+                        if line_number == 1:
+                            continue  # header
+                        raise CommandError(f"{path}:{line_number}: expected two user ids, got {row!r}")
+                    follows[follower_id].add(followee_id)
+        except OSError as e:
+            raise CommandError(str(e))
+        return follows
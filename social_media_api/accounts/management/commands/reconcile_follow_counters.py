@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.follows import recount_follow_counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute User.follower_count and User.following_count from the follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of users updated per query (default: 1000).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            updated += recount_follow_counters(batch)
+        self.stdout.write(self.style.SUCCESS(f"Recounted follow counters for {updated} user(s)."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:54
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Follow = User.following.through
+
+    def count_by(column):
+        rows = Follow.objects.filter(**{column: OuterRef('pk')}).order_by().values(column)
+        return Coalesce(Subquery(rows.annotate(total=Count('*')).values('total')), 0)
+
+    User.objects.update(follower_count=count_by('to_user'), following_count=count_by('from_user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_remove_user_followers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
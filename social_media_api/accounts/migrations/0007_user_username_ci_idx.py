@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_user_follow_counters'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('username'), models.F('id'), name='accounts_user_username_ci_idx'),
+        ),
+    ]
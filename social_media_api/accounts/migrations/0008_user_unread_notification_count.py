@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_counts(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Notification = apps.get_model('notifications', 'Notification')
+    rows = Notification.objects.filter(recipient=OuterRef('pk'), read=False).order_by().values('recipient')
+    User.objects.update(
+        unread_notification_count=Coalesce(Subquery(rows.annotate(total=Count('*')).values('total')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_user_username_ci_idx'),
+        ('notifications', '0005_notification_read'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notification_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models.functions import Lower
 
 
 class User(AbstractUser):
@@ -10,8 +11,20 @@ class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     
     following = models.ManyToManyField('self', related_name='followers_set', symmetrical=False, blank=True)
+    # Denormalized sizes of `followers_set` and `following`, kept in sync by
+    # accounts.signals and repaired by `manage.py reconcile_follow_counters`.
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # Denormalized number of unread notifications, kept in sync by
+    # notifications.unread and repaired by `manage.py reconcile_unread_counts`.
+    unread_notification_count = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive username prefix search in the user directory.
+            models.Index(Lower('username'), models.F('id'), name='accounts_user_username_ci_idx'),
+        ]
 
-   
     def __str__(self):
         return self.username
     
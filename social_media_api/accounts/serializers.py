@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from .models import User
 from django.contrib.auth import authenticate
+from django.conf import settings
 
 User = get_user_model()
 
@@ -43,13 +44,35 @@ class LoginSerializer(serializers.Serializer):
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['username', 'email', 'bio', 'profile_picture', 'followers']
+        fields = ['username', 'email', 'bio', 'profile_picture', 'follower_count', 'following_count']
+        read_only_fields = ['follower_count', 'following_count']
 
 
 class UserListSerializer(serializers.ModelSerializer):
-    followers_count = serializers.IntegerField(source='followers.count', read_only=True)
-    following_count = serializers.IntegerField(source='following.count', read_only=True)
+    followers_count = serializers.IntegerField(source='follower_count', read_only=True)
 
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers_count', 'following_count']
\ No newline at end of file
+        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        read_only_fields = ['following_count']
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=getattr(settings, 'BULK_FOLLOW_MAX_USERS', 500),
+    )
+
+
+class RelationshipQuerySerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=getattr(settings, 'RELATIONSHIP_LOOKUP_MAX_USERS', 100),
+    )
+
+    def to_internal_value(self, data):
+        # ?ids=1,2,3 as well as repeated ?ids=1&ids=2
+        ids = [part for value in data.getlist('ids') for part in value.split(',') if part]
+        return super().to_internal_value({'ids': ids})
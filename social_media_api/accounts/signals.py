@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_token, invalidate_user_tokens
+from .follows import recount_follow_counters
+from .graph import follow_graph
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def update_follow_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep follower_count/following_count in step with the following relation."""
+    # With reverse=True the change came through followers_set, so instance is
+    # the followed user and pk_set holds followers.
+    own_field, other_field = ('follower_count', 'following_count') if reverse else ('following_count', 'follower_count')
+
+    if action == 'post_add' and pk_set:
+        # Django only reports rows that were actually inserted here.
+        User.objects.filter(pk=instance.pk).update(**{own_field: F(own_field) + len(pk_set)})
+        User.objects.filter(pk__in=pk_set).update(**{other_field: F(other_field) + 1})
+        # Avoid a later instance.save() writing back a stale counter.
+        instance.refresh_from_db(fields=[own_field])
+    elif action == 'post_remove' and pk_set:
+        # pk_set may include ids that were never related, so recount.
+        recount_follow_counters({instance.pk, *pk_set})
+        instance.refresh_from_db(fields=['follower_count', 'following_count'])
+    elif action == 'pre_clear':
+        related = instance.followers_set if reverse else instance.following
+        instance._follow_counter_cleared_ids = set(related.values_list('id', flat=True))
+    elif action == 'post_clear':
+        recount_follow_counters({instance.pk, *getattr(instance, '_follow_counter_cleared_ids', ())})
+        instance.refresh_from_db(fields=['follower_count', 'following_count'])
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def update_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    """Apply committed follow changes to this process's follow-graph snapshot."""
+    if action in ('post_add', 'post_remove') and pk_set:
+        apply = follow_graph.add_edges if action == 'post_add' else follow_graph.remove_edges
+        edges = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    elif action == 'post_clear':
+        # Filled in at pre_clear by update_follow_counters.
+        cleared = getattr(instance, '_follow_counter_cleared_ids', ())
+        apply = follow_graph.remove_edges
+        edges = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in cleared]
+    else:
+        return
+    transaction.on_commit(lambda: apply(edges))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_cached_token(sender, instance, **kwargs):
+    """Logout and token rotation must take effect immediately."""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_cached_user_tokens(sender, instance, created, **kwargs):
+    """Cached credentials carry a copy of the user; drop it when the user changes."""
+    if not created:
+        invalidate_user_tokens(instance)
@@ -1,3 +1,418 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from notifications.models import NotificationOutbox
+from posts.models import Post, TimelineEntry
+
+from . import follows
+from .authentication import CachedTokenAuthentication, cache_key, local_token_cache
+from .graph import Follow, follow_graph
+
+User = get_user_model()
+
+
+class FollowCounterTestCase(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com")
+        self.bob = User.objects.create_user(username="bob", email="bob@example.com")
+        self.carol = User.objects.create_user(username="carol", email="carol@example.com")
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.follower_count, user.following_count
+
+    def test_add_and_remove_update_both_sides(self):
+        self.alice.following.add(self.bob, self.carol)
+        self.alice.following.add(self.bob)  # already followed: no change
+
+        self.assertEqual(self.counts(self.alice), (0, 2))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        self.alice.following.remove(self.bob, self.bob.pk + 100)
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_reverse_add_and_clear(self):
+        self.carol.followers_set.add(self.alice, self.bob)
+        self.assertEqual(self.counts(self.carol), (2, 0))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+
+        self.carol.followers_set.clear()
+        self.assertEqual(self.counts(self.carol), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_reconcile_command_repairs_drift(self):
+        self.alice.following.add(self.bob)
+        User.objects.filter(pk=self.bob.pk).update(follower_count=9)
+
+        call_command("reconcile_follow_counters", stdout=StringIO())
+
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UserListTestCase(APITestCase):
+
+    def test_user_list_counts_need_no_per_row_queries(self):
+        users = [User.objects.create_user(username=f"user{i}", email=f"user{i}@example.com") for i in range(5)]
+        for user in users[1:]:
+            user.following.add(users[0])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("register_list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        counts = {row["username"]: (row["followers_count"], row["following_count"]) for row in response.data["results"]}
+        self.assertEqual(counts["user0"], (4, 0))
+        self.assertEqual(counts["user1"], (0, 1))
+
+    def test_profile_includes_counts(self):
+        user = User.objects.create_user(username="me", email="me@example.com")
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse("profile"))
+
+        self.assertEqual(response.data["follower_count"], 0)
+        self.assertEqual(response.data["following_count"], 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UserDirectoryTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name in ["Abby", "abel", "Adam", "bob", "abner"]:
+            User.objects.create_user(username=name, email=f"{name.lower()}@example.com")
+        self.url = reverse("register_list")
+
+    def walk(self, params):
+        names = []
+        response = self.client.get(self.url, params)
+        while True:
+            names.extend(row["username"] for row in response.data["results"])
+            if not response.data["next"]:
+                return names
+            response = self.client.get(response.data["next"])
+
+    def test_directory_is_paged_by_id(self):
+        self.assertEqual(self.walk({"page_size": 2}), ["Abby", "abel", "Adam", "bob", "abner"])
+
+    def test_search_matches_username_prefix_case_insensitively(self):
+        self.assertEqual(self.walk({"search": "AB", "page_size": 2}), ["Abby", "abel", "abner"])
+
+    def test_search_matches_non_ascii_prefixes(self):
+        User.objects.create_user(username="Ñandu", email="nandu@example.com")
+        User.objects.create_user(username="Élise", email="elise@example.com")
+
+        self.assertEqual(self.walk({"search": "Ña"}), ["Ñandu"])
+        self.assertEqual(self.walk({"search": "É"}), ["Élise"])
+
+    def test_ndjson_export_streams_every_user(self):
+        self.client.force_authenticate(User.objects.create_user(username="zed", email="zed@example.com", is_staff=True))
+        response = self.client.get(self.url, {"export": "ndjson", "search": "a"})
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["username"] for row in rows], ["Abby", "abel", "abner", "Adam"])
+
+    def test_ndjson_export_is_staff_only(self):
+        self.assertEqual(self.client.get(self.url, {"export": "ndjson"}).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.force_authenticate(User.objects.get(username="bob"))
+        self.assertEqual(self.client.get(self.url, {"export": "ndjson"}).status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"export": "1/hour"}})
+    def test_ndjson_export_is_throttled(self):
+        self.client.force_authenticate(User.objects.create_user(username="zed", email="zed@example.com", is_staff=True))
+        self.assertEqual(self.client.get(self.url, {"export": "ndjson"}).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url, {"export": "ndjson"}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Browsing the directory is not.
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        local_token_cache.clear()
+        self.user = User.objects.create_user(username="reader", email="reader@example.com")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.url = reverse("notification-list")
+
+    def test_repeat_requests_skip_token_lookup(self):
+        with self.assertNumQueries(2):  # token + user, notification groups
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_shared_tier_serves_other_processes(self):
+        self.client.get(self.url)
+        local_token_cache.clear()
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_shared_tier_holds_no_secrets(self):
+        self.client.get(self.url)
+        entry = cache.get(cache_key(self.token.key))
+
+        self.assertNotIn("password", entry["user"])
+        self.assertNotIn(self.token.key, repr(entry))
+
+    def test_saving_cached_user_keeps_password(self):
+        self.user.set_password("secret-password")
+        self.user.save()
+        self.client.get(self.url)
+        user, token = CachedTokenAuthentication().authenticate_credentials(self.token.key)
+        user.bio = "Hello"
+        user.save()
+
+        self.assertEqual(token.user_id, self.user.pk)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.bio, "Hello")
+        self.assertTrue(self.user.check_password("secret-password"))
+
+    def test_logout_invalidates_token(self):
+        self.client.get(self.url)
+
+        self.assertEqual(self.client.post(reverse("logout")).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_invalidates_token(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class BulkFollowTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username="alice", email="alice@example.com")
+        self.others = [
+            User.objects.create_user(username=f"user{i}", email=f"user{i}@example.com") for i in range(3)
+        ]
+        self.post = Post.objects.create(title="Hi", content="Hello", author=self.others[0], fanned_out=True)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.alice).key}")
+
+    def test_bulk_follow_updates_counters_timeline_and_outbox(self):
+        self.alice.following.add(self.others[2])
+        ids = [user.pk for user in self.others] + [self.alice.pk, 9999]
+
+        response = self.client.post(reverse("bulk-follow"), {"user_ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            "followed": [self.others[0].pk, self.others[1].pk],
+            "already_following": [self.others[2].pk],
+            "not_found": [9999],
+        })
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.following_count, 3)
+        self.assertEqual(User.objects.get(pk=self.others[0].pk).follower_count, 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.alice, post=self.post).exists())
+        self.assertEqual(NotificationOutbox.objects.filter(actor=self.alice, verb="followed").count(), 2)
+
+    def test_concurrent_follow_is_not_counted_twice(self):
+        insert_follows = follows.insert_follows
+
+        def racing_insert(follower_id, target_ids):
+            # Another request inserts this follow after the existing ones were read.
+            Follow.objects.create(from_user_id=follower_id, to_user_id=self.others[0].pk)
+            return insert_follows(follower_id, target_ids)
+
+        with mock.patch("accounts.follows.insert_follows", racing_insert):
+            result = follows.bulk_follow(self.alice, [self.others[0].pk, self.others[1].pk])
+
+        self.assertEqual(result["followed"], [self.others[1].pk])
+        self.assertEqual(result["already_following"], [self.others[0].pk])
+        self.assertEqual(User.objects.get(pk=self.others[0].pk).follower_count, 0)
+        self.assertEqual(User.objects.get(pk=self.alice.pk).following_count, 1)
+        self.assertFalse(NotificationOutbox.objects.filter(recipient=self.others[0], verb="followed").exists())
+
+    def test_bulk_unfollow(self):
+        self.alice.following.add(*self.others)
+
+        response = self.client.post(
+            reverse("bulk-unfollow"), {"user_ids": [self.others[0].pk, self.others[1].pk]}, format="json"
+        )
+
+        self.assertEqual(response.data, {"unfollowed": [self.others[0].pk, self.others[1].pk]})
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.following_count, 1)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.alice).exists())
+
+    def test_rejects_empty_and_oversized_lists(self):
+        for ids in ([], list(range(1, 502))):
+            response = self.client.post(reverse("bulk-follow"), {"user_ids": ids}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_follows_from_csv(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("follower_id,followee_id\n")
+            for user in self.others:
+                f.write(f"{self.alice.pk},{user.pk}\n")
+            f.write(f"{self.others[1].pk},{self.alice.pk}\n")
+        self.addCleanup(os.remove, f.name)
+
+        call_command("import_follows", f.name, "--no-notify", stdout=StringIO())
+
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.follower_count, self.alice.following_count), (1, 3))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowGraphTestCase(APITestCase):
+
+    def setUp(self):
+        follow_graph.clear()
+        self.addCleanup(follow_graph.clear)
+        self.ann, self.ben, self.cat, self.dan, self.eve = [
+            User.objects.create_user(username=name, email=f"{name}@example.com")
+            for name in ("ann", "ben", "cat", "dan", "eve")
+        ]
+        self.ann.following.add(self.ben, self.eve)
+        self.ben.following.add(self.cat, self.dan)
+        self.eve.following.add(self.cat, self.ann)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.ann).key}")
+
+    def assertMatchesDatabase(self):
+        for user in User.objects.all():
+            self.assertEqual(follow_graph.following(user.pk), set(user.following.values_list("id", flat=True)))
+            self.assertEqual(follow_graph.followers(user.pk), set(user.followers_set.values_list("id", flat=True)))
+
+    def test_suggestions_rank_friends_of_friends(self):
+        response = self.client.get(reverse("follow-suggestions"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["username"], row["mutual_count"]) for row in response.data],
+            [("cat", 2), ("dan", 1)],
+        )
+
+    def test_mutual_followers(self):
+        response = self.client.get(reverse("mutual-followers", args=[self.cat.pk]))
+
+        self.assertEqual([row["username"] for row in response.data], ["ben", "eve"])
+
+    def test_commits_are_applied_incrementally(self):
+        follow_graph.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ann.following.add(self.cat)
+            self.ann.following.remove(self.ben, self.dan)
+            self.dan.followers_set.add(self.cat)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.eve.following.clear()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(follow_graph.suggestions(self.ann.pk), [(self.dan.pk, 1)])
+        self.assertMatchesDatabase()
+
+    @override_settings(FOLLOW_GRAPH_MAX_DELTA=2)
+    def test_overlay_is_compacted(self):
+        follow_graph.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dan.following.add(self.ann, self.ben)
+            self.ben.following.remove(self.cat)
+
+        self.assertEqual(follow_graph.delta_size, 0)
+        self.assertMatchesDatabase()
+
+    def test_follows_made_during_a_load_are_kept(self):
+        read_edges = follow_graph._read_edges
+
+        def read_then_follow():
+            edges = read_edges()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.dan.following.add(self.eve)
+            return edges
+
+        with mock.patch.object(follow_graph, "_read_edges", read_then_follow):
+            follow_graph.load()
+
+        self.assertEqual(follow_graph.followers(self.eve.pk), {self.ann.pk, self.dan.pk})
+        self.assertMatchesDatabase()
+
+    def test_stale_snapshot_reloads_off_the_request_path(self):
+        follow_graph.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.dan.following.add(self.eve)
+        follow_graph._loaded_at -= 3600
+        release = threading.Event()
+        edges = list(Follow.objects.values_list("from_user_id", "to_user_id"))
+
+        def slow_read():
+            release.wait(5)
+            return edges
+
+        with mock.patch.object(follow_graph, "_read_edges", slow_read):
+            follow_graph.ensure_loaded()
+            follow_graph.ensure_loaded()  # already reloading: no second thread
+            loader = follow_graph._loader
+            # The old snapshot keeps answering meanwhile.
+            self.assertIn(self.dan.pk, follow_graph.followers(self.eve.pk))
+            release.set()
+            loader.join(5)
+
+        self.assertIs(follow_graph._loader, loader)
+        self.assertEqual(follow_graph.delta_size, 0)
+        self.assertMatchesDatabase()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RelationshipLookupTestCase(APITestCase):
+
+    def setUp(self):
+        self.me, self.friend, self.fan, self.idol, self.stranger = [
+            User.objects.create_user(username=name, email=f"{name}@example.com")
+            for name in ("me", "friend", "fan", "idol", "stranger")
+        ]
+        self.me.following.add(self.friend, self.idol)
+        self.me.followers_set.add(self.friend, self.fan)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.me).key}")
+
+    def test_answers_every_id_in_request_order(self):
+        ids = [self.stranger.pk, self.friend.pk, self.fan.pk, self.idol.pk, 9999]
+        url = reverse("relationships")
+        self.client.get(url, {"ids": "1"})  # warm the token cache
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"ids": ",".join(map(str, ids))})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["id"], row["following"], row["followed_by"]) for row in response.data],
+            [
+                (self.stranger.pk, False, False),
+                (self.friend.pk, True, True),
+                (self.fan.pk, False, True),
+                (self.idol.pk, True, False),
+                (9999, False, False),
+            ],
+        )
+
+    def test_rejects_bad_ids(self):
+        for ids in ("", "a,b", ",".join(map(str, range(1, 102)))):
+            response = self.client.get(reverse("relationships"), {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,16 +1,26 @@
 
 from django.urls import path
-from .views import RegisterView, RegisterListView, LoginView, ProfileView, FollowUserView, UnfollowUserView
+from .views import (
+    RegisterView, RegisterListView, LoginView, LogoutView, ProfileView, FollowUserView, UnfollowUserView,
+    BulkFollowView, BulkUnfollowView, SuggestionsView, MutualFollowersView,
+    RelationshipsView,
+)
 
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('users/', RegisterListView.as_view(), name='register_list'),
     
     path('follow/<int:user_id>/', FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:user_id>/', UnfollowUserView.as_view(), name='unfollow-user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='bulk-follow'),
+    path('unfollow/bulk/', BulkUnfollowView.as_view(), name='bulk-unfollow'),
+    path('relationships/', RelationshipsView.as_view(), name='relationships'),
+    path('suggestions/', SuggestionsView.as_view(), name='follow-suggestions'),
+    path('users/<int:user_id>/mutuals/', MutualFollowersView.as_view(), name='mutual-followers'),
 
 
 ]
@@ -1,27 +1,92 @@
+import json
+
+from django.db.models import Value
+from django.db.models.functions import Concat, Lower
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect
 from rest_framework.authtoken.models import Token
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status, permissions, generics
-from .serializers import RegisterSerializer, LoginSerializer, ProfileSerializer, UserListSerializer
+from .serializers import (RegisterSerializer, LoginSerializer, ProfileSerializer, UserListSerializer, BulkFollowSerializer,
+                          RelationshipQuerySerializer)
 from rest_framework.generics import CreateAPIView
 from django.contrib.auth import get_user_model
 from rest_framework.generics import GenericAPIView
-from rest_framework.authentication import TokenAuthentication
+from .authentication import CachedTokenAuthentication
+from .follows import bulk_follow, bulk_unfollow, relationships
+from .graph import follow_graph
 from .models import User as CustomUser
-from notifications.models import Notification
+from social_media_api.pagination import KeysetPagination
 User = get_user_model()
 
 class RegisterView(CreateAPIView):
+    throttle_scope = 'register'
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     
-class RegisterListView(APIView):
-    def get(self, request):
+class RegisterListView(generics.ListAPIView):
+    """
+    User directory, paged by id with keyset cursors.
+
+    ?search=<prefix> filters on a case-insensitive username prefix (served by
+    the Lower(username) index) and pages in username order instead. Case is
+    folded by the database's lower(), which on SQLite covers ASCII only, so
+    there non-ASCII letters match their own case.
+    ?export=ndjson streams every matching user, email included, as
+    newline-delimited JSON, reading the table in chunks so memory use does
+    not grow with it. Exports are for staff only and throttled under the
+    'export' scope.
+    """
+    serializer_class = UserListSerializer
+    pagination_class = KeysetPagination
+    export_chunk_size = 2000
+    throttle_scope = 'export'
+
+    def is_export(self):
+        return self.request.query_params.get('export') == 'ndjson'
+
+    @property
+    def throttle_reads(self):
+        return self.is_export()
+
+    def get_permissions(self):
+        if self.is_export():
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def get_search_prefix(self):
+        return self.request.query_params.get('search', '').strip()
+
+    @property
+    def keyset_ordering(self):
+        return ('username_lower', 'id') if self.get_search_prefix() else ('id',)
+
+    def get_queryset(self):
         users = User.objects.all()
-        serializer = UserListSerializer(users, many=True)
-        return Response(serializer.data)
-    
+        prefix = self.get_search_prefix()
+        if prefix:
+            # A range over lower(username) rather than LIKE, so the expression
+            # index can be used on every backend. The prefix is lowercased by
+            # the database too: SQLite's lower() only folds ASCII, and
+            # Python's str.lower() would not match it.
+            prefix = Lower(Value(prefix))
+            users = users.annotate(username_lower=Lower('username')).filter(
+                username_lower__gte=prefix,
+                username_lower__lt=Concat(prefix, Value('\U0010ffff')),
+            )
+        return users
+
+    def list(self, request, *args, **kwargs):
+        if self.is_export():
+            return self.export_ndjson()
+        return super().list(request, *args, **kwargs)
+
+    def export_ndjson(self):
+        users = self.get_queryset().order_by(*self.keyset_ordering).iterator(chunk_size=self.export_chunk_size)
+        rows = (json.dumps(UserListSerializer(user).data) + '\n' for user in users)
+        return StreamingHttpResponse(rows, content_type='application/x-ndjson')
+
 
 
 class LoginView(GenericAPIView):
@@ -37,15 +102,27 @@ class LoginView(GenericAPIView):
             "token": token.key,
             "username": user.username
         })
+class LogoutView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        # Deleting the token also evicts it from the auth cache.
+        request.auth.delete()
+        return Response({"message": "Logged out"}, status=status.HTTP_200_OK)
+
+
 class ProfileView(APIView):
     def get(self, request):
-        user = request.user
+        # request.user may come from the auth cache; counters must be fresh.
+        user = User.objects.get(pk=request.user.pk)
         serializer = ProfileSerializer(user)
         return Response(serializer.data)
 
 class FollowUserView(generics.GenericAPIView):
+    throttle_scope = 'follows'
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = CustomUser.objects.all()  # <-- satisfies the check
     lookup_url_kwarg = 'user_id'
 
@@ -53,23 +130,14 @@ class FollowUserView(generics.GenericAPIView):
         target_user = self.get_object()  # uses queryset above
         if target_user == request.user:
             return Response({"error": "You cannot follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
-        request.user.following.add(target_user)
+        # Notifies only if the follow is new, so repeated requests don't.
+        bulk_follow(request.user, [target_user.pk])
         return Response({"message": f"You are now following {target_user.username}"}, status=status.HTTP_200_OK)
-        
-        request.user.following.add(target_user)
-
-        # Create notification for the followed user
-        Notification.objects.create(
-            recipient=target_user,
-            actor=request.user,
-            verb="followed"
-        )
-
-        return Response({"message": f"You are now following {target_user.username}"}, status=200)
 
 class UnfollowUserView(generics.GenericAPIView):
+    throttle_scope = 'follows'
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     queryset = CustomUser.objects.all()
     lookup_url_kwarg = 'user_id'
 
@@ -78,4 +146,88 @@ class UnfollowUserView(generics.GenericAPIView):
         if target_user == request.user:
             return Response({"error": "You cannot unfollow yourself"}, status=status.HTTP_400_BAD_REQUEST)
         request.user.following.remove(target_user)
-        return Response({"message": f"You have unfollowed {target_user.username}"}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"message": f"You have unfollowed {target_user.username}"}, status=status.HTTP_200_OK)
+
+
+class BulkFollowView(generics.GenericAPIView):
+    """Follow up to BULK_FOLLOW_MAX_USERS accounts in one request."""
+    throttle_scope = 'follows'
+    serializer_class = BulkFollowSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = bulk_follow(request.user, serializer.validated_data['user_ids'])
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(generics.GenericAPIView):
+    throttle_scope = 'follows'
+    serializer_class = BulkFollowSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        unfollowed = bulk_unfollow(request.user, serializer.validated_data['user_ids'])
+        return Response({"unfollowed": unfollowed}, status=status.HTTP_200_OK)
+
+
+def users_in_order(user_ids):
+    users = User.objects.in_bulk(user_ids)
+    return [users[user_id] for user_id in user_ids if user_id in users]
+
+
+class SuggestionsView(APIView):
+    """
+    "People you may know": accounts followed by the people you follow,
+    ranked by how many of them follow each one. ?limit= caps the list
+    (default 20, at most 100).
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            limit = 20
+        follow_graph.ensure_loaded()
+        suggestions = follow_graph.suggestions(request.user.pk, limit=limit)
+        mutual_counts = dict(suggestions)
+        users = users_in_order([user_id for user_id, _ in suggestions])
+        return Response([
+            {**UserListSerializer(user).data, 'mutual_count': mutual_counts[user.pk]}
+            for user in users
+        ])
+
+
+class MutualFollowersView(APIView):
+    """Accounts you follow that also follow the given user."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, user_id):
+        follow_graph.ensure_loaded()
+        users = users_in_order(follow_graph.mutual_followers(request.user.pk, user_id))
+        return Response(UserListSerializer(users, many=True).data)
+
+
+class RelationshipsView(APIView):
+    """
+    GET ?ids=1,2,3 -> whether you follow each user and whether they follow
+    you, answered with one query for up to RELATIONSHIP_LOOKUP_MAX_USERS ids.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        serializer = RelationshipQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        found = relationships(request.user, ids)
+        return Response([{'id': user_id, **found[user_id]} for user_id in ids])
@@ -0,0 +1,89 @@
+"""
+Outbox-based notification dispatch.
+
+Views call enqueue()/enqueue_many() to record an event in NotificationOutbox,
+a single cheap insert regardless of how many notifications it will produce.
+The dispatch_notifications worker drains the outbox in batches, coalesces
+duplicate (recipient, actor, verb, target_post) events, bulk-creates the
+Notification rows, folds them into their NotificationGroup rollups and
+raises their recipients' unread counts.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Notification, NotificationOutbox
+from .rollup import roll_up
+from .unread import record_created
+
+
+def get_batch_size():
+    return getattr(settings, 'NOTIFICATION_DISPATCH_BATCH_SIZE', 500)
+
+
+def enqueue(recipient, actor, verb, target_post=None):
+    """Record a notification event to be delivered by the dispatcher."""
+    if recipient == actor:
+        return None
+    return NotificationOutbox.objects.create(recipient=recipient, actor=actor, verb=verb, target_post=target_post)
+
+
+def enqueue_many(events):
+    """
+    Record several events in one insert. ``events`` is an iterable of
+    (recipient_id, actor_id, verb, target_post_id) tuples.
+    """
+    rows = [
+        NotificationOutbox(recipient_id=recipient_id, actor_id=actor_id, verb=verb, target_post_id=target_post_id)
+        for recipient_id, actor_id, verb, target_post_id in events
+        if recipient_id != actor_id
+    ]
+    return NotificationOutbox.objects.bulk_create(rows, batch_size=get_batch_size())
+
+
+def dispatch_pending(batch_size=None):
+    """
+    Move one batch of outbox events into Notification rows.
+    Returns (events consumed, notifications created).
+    """
+    batch_size = batch_size or get_batch_size()
+    with transaction.atomic():
+        pending = NotificationOutbox.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Lets several workers drain the outbox without blocking each other.
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending[:batch_size])
+        if not events:
+            return 0, 0
+
+        coalesced = {}
+        for event in events:
+            key = (event.recipient_id, event.actor_id, event.verb, event.target_post_id)
+            coalesced.setdefault(key, event)
+
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=event.recipient_id,
+                    actor_id=event.actor_id,
+                    verb=event.verb,
+                    target_post_id=event.target_post_id,
+                )
+                for event in coalesced.values()
+            ],
+            batch_size=batch_size,
+        )
+        roll_up(notifications)
+        record_created(notifications)
+        NotificationOutbox.objects.filter(id__in=[event.id for event in events]).delete()
+    return len(events), len(coalesced)
+
+
+def dispatch_all(batch_size=None):
+    """Drain the outbox completely. Returns (events consumed, notifications created)."""
+    consumed = created = 0
+    while True:
+        batch_consumed, batch_created = dispatch_pending(batch_size)
+        if not batch_consumed:
+            return consumed, created
+        consumed += batch_consumed
+        created += batch_created
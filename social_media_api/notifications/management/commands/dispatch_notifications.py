@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import dispatch_all
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notification events from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Events per transaction (default: NOTIFICATION_DISPATCH_BATCH_SIZE).")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when the outbox is empty (default: 1.0).")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the outbox once and exit instead of polling.")
+
+    def handle(self, *args, **options):
+        while True:
+            consumed, created = dispatch_all(options['batch_size'])
+            if consumed:
+                self.stdout.write(f"Dispatched {consumed} event(s) as {created} notification(s).")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
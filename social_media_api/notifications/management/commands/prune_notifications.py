@@ -0,0 +1,74 @@
+import gzip
+import os
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notifications.models import Notification, NotificationGroup
+from notifications.retention import get_retention_days, prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete notifications (and their rollup groups) older than the retention period in "
+        "bounded batches, optionally archiving them to gzip-compressed JSONL first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=None, metavar='DAYS',
+                            help="Age in days past which notifications are removed "
+                                 "(default: NOTIFICATION_RETENTION_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Rows deleted per transaction (default: 1000).")
+        parser.add_argument('--archive-dir',
+                            help="Append deleted notifications to a .jsonl.gz file in this directory.")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches to leave room for other writers (default: 0).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report how many rows would be removed without removing them.")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        days = get_retention_days() if options['older_than'] is None else options['older_than']
+        if days < 0 or options['batch_size'] < 1:
+            raise CommandError("--older-than must be >= 0 and --batch-size >= 1.")
+        now = timezone.now()
+        cutoff = now - timedelta(days=days)
+
+        if options['dry_run']:
+            notifications = Notification.objects.filter(timestamp__lt=cutoff).count()
+            groups = NotificationGroup.objects.filter(updated_at__lt=cutoff).count()
+            self.stdout.write(
+                f"Would remove {notifications} notification(s) and {groups} group(s) older than {cutoff:%Y-%m-%d %H:%M}."
+            )
+            return
+
+        path = None
+        archive = nullcontext()
+        if options['archive_dir']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            path = os.path.join(options['archive_dir'], f'notifications-{now:%Y%m%dT%H%M%S}.jsonl.gz')
+            archive = gzip.open(path, 'at', encoding='utf-8')
+
+        with archive as archive_file:
+            stats = prune(
+                cutoff, options['batch_size'], archive=archive_file, pause=options['pause'], progress=self.progress,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {stats.notifications} notification(s) and {stats.groups} group(s) "
+            f"in {stats.seconds:.1f}s ({stats.rows_per_second:.0f} rows/s)."
+        ))
+        if path is not None:
+            if stats.notifications:
+                self.stdout.write(f"Archived notifications to {path}")
+            else:
+                os.remove(path)
+
+    def progress(self, stats):
+        if self.verbosity >= 2:
+            self.stdout.write(
+                f"  {stats.notifications} notification(s), {stats.groups} group(s), {stats.rows_per_second:.0f} rows/s"
+            )
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from notifications.unread import recount_unread
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute User.unread_notification_count from the notifications table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of users updated per query (default: 1000).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            updated += recount_unread(batch)
+        self.stdout.write(self.style.SUCCESS(f"Recounted unread notifications for {updated} user(s)."))
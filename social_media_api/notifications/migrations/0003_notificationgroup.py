@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def backfill_groups(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationGroup = apps.get_model('notifications', 'NotificationGroup')
+    bucket_seconds = getattr(settings, 'NOTIFICATION_ROLLUP_BUCKET_SECONDS', 24 * 60 * 60)
+
+    # Distinct actors and the latest notification of every group, the same
+    # counts roll_up keeps from here on.
+    actors = defaultdict(set)
+    latest = {}
+    rows = Notification.objects.order_by('timestamp', 'id').values_list(
+        'recipient_id', 'verb', 'target_post_id', 'timestamp', 'actor_id',
+    )
+    for recipient_id, verb, target_post_id, timestamp, actor_id in rows.iterator():
+        epoch = int(timestamp.timestamp())
+        key = (recipient_id, verb, target_post_id, datetime.fromtimestamp(epoch - epoch % bucket_seconds, tz=timezone.utc))
+        actors[key].add(actor_id)
+        latest[key] = (actor_id, timestamp)
+
+    groups = []
+    for (recipient_id, verb, target_post_id, start), (actor_id, timestamp) in latest.items():
+        groups.append(NotificationGroup(
+            recipient_id=recipient_id,
+            verb=verb,
+            target_post_id=target_post_id,
+            bucket_start=start,
+            actor_count=len(actors[recipient_id, verb, target_post_id, start]),
+            latest_actor_id=actor_id,
+            updated_at=timestamp,
+        ))
+    NotificationGroup.objects.bulk_create(groups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_notificationoutbox'),
+        ('posts', '0004_post_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(max_length=255)),
+                ('bucket_start', models.DateTimeField()),
+                ('actor_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('latest_actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('recipient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_groups', to=settings.AUTH_USER_MODEL)),
+                ('target_post', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', '-updated_at', '-id'], name='notif_group_inbox_idx')],
+                'unique_together': {('recipient', 'verb', 'target_post', 'bucket_start')},
+            },
+        ),
+        migrations.RunPython(backfill_groups, migrations.RunPython.noop),
+    ]
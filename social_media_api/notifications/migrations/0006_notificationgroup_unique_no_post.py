@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:41
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_groups(apps, schema_editor):
+    # Concurrent dispatchers could each create a group without a target post
+    # for the same recipient, verb and bucket. Keep the latest of each set and
+    # recount its actors from the notifications.
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationGroup = apps.get_model('notifications', 'NotificationGroup')
+    bucket = timedelta(seconds=getattr(settings, 'NOTIFICATION_ROLLUP_BUCKET_SECONDS', 24 * 60 * 60))
+    duplicated = (
+        NotificationGroup.objects.filter(target_post__isnull=True)
+        .values('recipient_id', 'verb', 'bucket_start')
+        .annotate(groups=Count('id'))
+        .filter(groups__gt=1)
+    )
+    for row in duplicated:
+        members = NotificationGroup.objects.filter(
+            target_post__isnull=True, recipient_id=row['recipient_id'], verb=row['verb'], bucket_start=row['bucket_start'],
+        )
+        keep = members.order_by('-updated_at', '-id').first()
+        members.exclude(pk=keep.pk).delete()
+        actor_count = Notification.objects.filter(
+            recipient_id=row['recipient_id'],
+            verb=row['verb'],
+            target_post__isnull=True,
+            timestamp__gte=row['bucket_start'],
+            timestamp__lt=row['bucket_start'] + bucket,
+        ).values('actor_id').distinct().count()
+        NotificationGroup.objects.filter(pk=keep.pk).update(actor_count=actor_count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_read'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_groups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notificationgroup',
+            constraint=models.UniqueConstraint(condition=models.Q(('target_post__isnull', True)), fields=('recipient', 'verb', 'bucket_start'), name='notif_group_unique_no_post'),
+        ),
+    ]
@@ -10,4 +10,61 @@ class Notification(models.Model):
     actor = models.ForeignKey(User, related_name='actor_notifications', on_delete=models.CASCADE)
     verb = models.CharField(max_length=255)
     target_post = models.ForeignKey('posts.Post', related_name='post_notifications', null=True, blank=True, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recipient_recent_idx'),
+            # Only unread rows are counted and marked read, and they are a
+            # small share of the table once users catch up.
+            models.Index(fields=['recipient', 'id'], condition=models.Q(read=False), name='notif_unread_idx'),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """
+    Pending notification events written in the request path and turned into
+    Notification rows by `manage.py dispatch_notifications`.
+    """
+    recipient = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    actor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    target_post = models.ForeignKey('posts.Post', related_name='+', null=True, blank=True, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.actor} {self.verb} -> {self.recipient}'
+
+
+class NotificationGroup(models.Model):
+    """
+    Rollup of notifications sharing a recipient, verb and target post within
+    one time bucket ("alice and 41 others liked your post"). Maintained by the
+    dispatcher as notifications are created.
+    """
+    recipient = models.ForeignKey(User, related_name='notification_groups', on_delete=models.CASCADE)
+    verb = models.CharField(max_length=255)
+    target_post = models.ForeignKey('posts.Post', related_name='+', null=True, blank=True, on_delete=models.CASCADE)
+    bucket_start = models.DateTimeField()
+    actor_count = models.PositiveIntegerField(default=0)
+    latest_actor = models.ForeignKey(User, related_name='+', on_delete=models.CASCADE)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('recipient', 'verb', 'target_post', 'bucket_start')
+        constraints = [
+            # NULLs never collide in the unique index above, so "followed"
+            # groups (no target post) need their own.
+            models.UniqueConstraint(
+                fields=['recipient', 'verb', 'bucket_start'],
+                condition=models.Q(target_post__isnull=True),
+                name='notif_group_unique_no_post',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['recipient', '-updated_at', '-id'], name='notif_group_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient}: {self.actor_count} x {self.verb}'
@@ -0,0 +1,104 @@
+"""
+Notification retention.
+
+prune() deletes notifications older than a cutoff, and the rollup groups
+that stopped changing before it, in batches of bounded size. Each batch is
+its own short transaction, so locks are held for one batch at a time and an
+interrupted run can simply be started again.
+
+Old rows have the lowest ids, so batches are read in id order and the scan
+ends at the first batch that comes back short.
+
+Deleted notifications can first be appended to a gzip-compressed JSONL
+archive. A batch is written to the archive before its transaction commits.
+If the transaction then fails, the next run archives that batch again, so an
+archive may repeat ids but never misses one.
+"""
+import json
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import Notification, NotificationGroup
+from .unread import record_deleted
+
+ARCHIVE_FIELDS = ('id', 'recipient_id', 'actor_id', 'verb', 'target_post_id', 'timestamp', 'read')
+
+
+def get_retention_days():
+    return getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+
+
+@dataclass
+class PruneStats:
+    notifications: int = 0
+    groups: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows(self):
+        return self.notifications + self.groups
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _delete_in_batches(rows, batch_size, pause, before_delete=None):
+    """
+    Delete the rows of ``rows`` (a values() queryset including 'id'), one
+    transaction per batch, and yield the size of each batch.
+    ``before_delete`` is called with each batch inside its transaction.
+    """
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(rows.select_for_update().filter(id__gt=last_id).order_by('id')[:batch_size])
+            if batch:
+                last_id = batch[-1]['id']
+                if before_delete is not None:
+                    before_delete(batch)
+                rows.model.objects.filter(id__in=[row['id'] for row in batch]).delete()
+        if batch:
+            yield len(batch)
+        if len(batch) < batch_size:
+            return
+        if pause:
+            time.sleep(pause)
+
+
+def prune(cutoff, batch_size=1000, archive=None, pause=0, progress=None):
+    """
+    Delete notifications with a timestamp before ``cutoff`` and groups last
+    updated before it. ``archive`` is a text file object receiving one JSON
+    line per deleted notification. ``progress`` is called with the running
+    PruneStats after every batch. Returns the final PruneStats.
+    """
+    stats = PruneStats()
+    started = time.perf_counter()
+
+    def archive_and_uncount(rows):
+        if archive is not None:
+            archive.writelines(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+            archive.flush()
+        record_deleted(row['recipient_id'] for row in rows if not row['read'])
+
+    old = Notification.objects.filter(timestamp__lt=cutoff).values(*ARCHIVE_FIELDS)
+    for deleted in _delete_in_batches(old, batch_size, pause, archive_and_uncount):
+        stats.notifications += deleted
+        stats.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(stats)
+
+    stale = NotificationGroup.objects.filter(updated_at__lt=cutoff).values('id')
+    for deleted in _delete_in_batches(stale, batch_size, pause):
+        stats.groups += deleted
+        stats.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(stats)
+
+    stats.seconds = time.perf_counter() - started
+    return stats
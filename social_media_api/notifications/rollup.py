@@ -0,0 +1,72 @@
+"""
+Incremental notification rollups.
+
+Every notification is folded into the NotificationGroup for its
+(recipient, verb, target_post, time bucket), so an inbox shows one row for
+"alice and 41 others liked your post" instead of 42 separate events.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import Notification, NotificationGroup
+
+
+def get_bucket_seconds():
+    return getattr(settings, 'NOTIFICATION_ROLLUP_BUCKET_SECONDS', 24 * 60 * 60)
+
+
+def bucket_start(timestamp):
+    """Start of the rollup bucket that ``timestamp`` falls into."""
+    seconds = get_bucket_seconds()
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def roll_up(notifications):
+    """Fold freshly created notifications into their groups."""
+    grouped = defaultdict(list)
+    for notification in notifications:
+        key = (
+            notification.recipient_id,
+            notification.verb,
+            notification.target_post_id,
+            bucket_start(notification.timestamp),
+        )
+        grouped[key].append(notification)
+
+    for (recipient_id, verb, target_post_id, start), members in grouped.items():
+        latest = max(members, key=lambda notification: notification.timestamp)
+        # actor_count counts people, so an actor already in the group (say,
+        # someone who commented twice) doesn't count again.
+        actor_ids = {notification.actor_id for notification in members}
+        actor_ids -= set(
+            Notification.objects.filter(
+                recipient_id=recipient_id,
+                verb=verb,
+                target_post_id=target_post_id,
+                timestamp__gte=start,
+                timestamp__lt=start + timedelta(seconds=get_bucket_seconds()),
+                actor_id__in=actor_ids,
+            ).exclude(pk__in=[notification.pk for notification in members]).values_list('actor_id', flat=True)
+        )
+        group, created = NotificationGroup.objects.get_or_create(
+            recipient_id=recipient_id,
+            verb=verb,
+            target_post_id=target_post_id,
+            bucket_start=start,
+            defaults={
+                'actor_count': len(actor_ids),
+                'latest_actor_id': latest.actor_id,
+                'updated_at': latest.timestamp,
+            },
+        )
+        if not created:
+            NotificationGroup.objects.filter(pk=group.pk).update(
+                actor_count=F('actor_count') + len(actor_ids),
+                latest_actor_id=latest.actor_id,
+                updated_at=latest.timestamp,
+            )
+    return len(grouped)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Notification
+from .models import Notification, NotificationGroup
 
 class NotificationSerializer(serializers.ModelSerializer):
     actor_username = serializers.CharField(source='actor.username', read_only=True)
@@ -16,8 +16,7 @@ class NotificationSerializer(serializers.ModelSerializer):
             'actor_username',
             'verb',
             'target_type',
-            'target_content_type',
-            'target_object_id',
+            'target_post',
             'timestamp',
             'read'
         ]
@@ -26,6 +25,54 @@ class NotificationSerializer(serializers.ModelSerializer):
         """
         Returns the model name of the target object for easy display
         """
-        if obj.target:
-            return obj.target._meta.model_name
+        if obj.target_post_id:
+            return 'post'
         return None
+
+
+class NotificationGroupSerializer(serializers.ModelSerializer):
+    latest_actor_username = serializers.CharField(source='latest_actor.username', read_only=True)
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NotificationGroup
+        fields = [
+            'id',
+            'verb',
+            'target_post',
+            'actor_count',
+            'latest_actor',
+            'latest_actor_username',
+            'summary',
+            'bucket_start',
+            'updated_at',
+        ]
+
+    def get_summary(self, obj):
+        """
+        Human readable rollup, e.g. "alice and 41 others liked your post"
+        """
+        others = obj.actor_count - 1
+        actors = obj.latest_actor.username
+        if others == 1:
+            actors += " and 1 other"
+        elif others > 1:
+            actors += f" and {others} others"
+        target = " your post" if obj.target_post_id else ""
+        return f"{actors} {obj.verb}{target}"
+
+
+class NotificationEventSerializer(serializers.ModelSerializer):
+    """A single notification as pushed to live streams."""
+    actor_username = serializers.CharField(source='actor.username', read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'recipient', 'actor', 'actor_username', 'verb', 'target_post', 'timestamp', 'read']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    up_to = serializers.IntegerField(
+        min_value=1, required=False,
+        help_text="Mark notifications with ids up to this one read; omit to mark all.",
+    )
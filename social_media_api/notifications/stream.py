@@ -0,0 +1,205 @@
+"""
+Live delivery of new notifications.
+
+NotificationHub is an in-process pub/sub. While any client of this process
+is connected, a single task polls the notifications table and wakes the
+subscribers of every recipient that has new rows. That is one primary-key
+range scan per interval, however many clients are connected. A woken
+subscriber reads its own notifications from its cursor.
+
+Ids are assigned when a row is inserted but become visible when its
+transaction commits, so with several dispatchers a lower id can appear
+after a higher one. Nothing relies on ids committing in order: the hub
+re-scans every id it has not known to be committed for at least
+NOTIFICATION_STREAM_GRACE_SECONDS (which must exceed the longest
+dispatch transaction), and a Cursor records the ids delivered above that
+point as well as the point itself.
+
+The database stays the source of truth: a client resumes from the cursor of
+the last event it received, and everything after it is replayed before live
+delivery starts.
+"""
+import asyncio
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Notification
+
+# Notifications read per query, by the hub and per stream read or long poll.
+BATCH_SIZE = 500
+# Delivered ids above the floor that a serialized cursor carries. Past that
+# the oldest are left out, which can deliver them again on resume but never
+# loses one.
+MAX_SEEN = 100
+
+
+def get_poll_interval():
+    return getattr(settings, 'NOTIFICATION_STREAM_POLL_INTERVAL', 1.0)
+
+
+def get_grace_seconds():
+    return getattr(settings, 'NOTIFICATION_STREAM_GRACE_SECONDS', 10)
+
+
+class Cursor:
+    """
+    A client's position in its notifications: everything with an id up to
+    ``floor`` and the ids in ``seen`` have been delivered. Serialized as
+    "floor" or "floor:id,id,..." for Last-Event-ID and ``?since=``; a plain
+    notification id is a cursor without seen ids.
+    """
+
+    def __init__(self, floor=0, seen=()):
+        self.floor = floor
+        self.seen = set(seen)
+
+    @classmethod
+    def parse(cls, value):
+        floor, _, seen = value.partition(':')
+        seen = sorted({int(notification_id) for notification_id in seen.split(',') if notification_id})
+        cursor = cls(int(floor), seen[-MAX_SEEN:])
+        if cursor.floor < 0:
+            raise ValueError(value)
+        return cursor
+
+    def __str__(self):
+        if not self.seen:
+            return str(self.floor)
+        return f"{self.floor}:{','.join(map(str, sorted(self.seen)[-MAX_SEEN:]))}"
+
+    def mark(self, notification_id):
+        # Kept in full while the stream is open: these are only the ids above
+        # the floor, which catches up once the grace period has passed.
+        self.seen.add(notification_id)
+
+    def advance(self, committed_id):
+        """Raise the floor to an id below which every row has committed."""
+        if committed_id > self.floor:
+            self.floor = committed_id
+            self.seen = {notification_id for notification_id in self.seen if notification_id > committed_id}
+
+
+def notifications_after(recipient_id, since_id):
+    """A recipient's notifications with ids above ``since_id``, oldest first."""
+    return (
+        Notification.objects.filter(recipient_id=recipient_id, id__gt=since_id)
+        .select_related('actor').order_by('id')
+    )
+
+
+async def aundelivered(recipient_id, cursor):
+    """
+    Up to BATCH_SIZE of the recipient's notifications the cursor has not
+    had, oldest first, and the id the cursor's floor may then advance to.
+    The caller marks each row on the cursor as it is delivered; a full
+    batch means there may be more to read straight away.
+    """
+    # Read before the query: every row up to it is visible to the query.
+    committed_id = hub.committed_id
+    unseen = notifications_after(recipient_id, cursor.floor).exclude(id__in=cursor.seen)
+    rows = [row async for row in unseen[:BATCH_SIZE]]
+    if len(rows) == BATCH_SIZE:
+        # Rows past the batch haven't been read yet.
+        committed_id = min(committed_id, rows[-1].id)
+    return rows, committed_id
+
+
+async def acurrent_cursor(recipient_id):
+    """A cursor past every notification the recipient has so far."""
+    cutoff = timezone.now() - timedelta(seconds=get_grace_seconds())
+    recent = Notification.objects.filter(recipient_id=recipient_id, timestamp__gte=cutoff)
+    seen = [notification_id async for notification_id in recent.values_list('id', flat=True)]
+    older = Notification.objects.filter(recipient_id=recipient_id, timestamp__lt=cutoff).order_by('-timestamp')
+    floor = await older.values_list('id', flat=True).afirst()
+    return Cursor(floor or 0, [notification_id for notification_id in seen if notification_id > (floor or 0)])
+
+
+class Subscription:
+
+    def __init__(self, recipient_id):
+        self.recipient_id = recipient_id
+        self.woken = asyncio.Event()
+
+    async def wait(self, timeout):
+        """Wait until the recipient may have new notifications; False on timeout."""
+        try:
+            await asyncio.wait_for(self.woken.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.woken.clear()
+        return True
+
+
+class NotificationHub:
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._task = None
+        # Every notification with an id up to this one has committed.
+        self.committed_id = 0
+
+    def subscribe(self, recipient_id):
+        subscription = Subscription(recipient_id)
+        self._subscribers[recipient_id].add(subscription)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.recipient_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.recipient_id]
+        if not self._subscribers and self._task is not None:
+            # Nobody left to deliver to; the next subscriber starts a new poller.
+            self._task.cancel()
+            self._task = None
+
+    def _wake(self, recipient_id):
+        for subscription in self._subscribers.get(recipient_id, ()):
+            subscription.woken.set()
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        self.committed_id = 0
+        newest = (await Notification.objects.aaggregate(newest=Max('id')))['newest'] or 0
+        # Rows just below the newest may still be committing when the hub
+        # starts; older ones are taken as committed and never scanned again.
+        scan_from = self.committed_id = max(newest - BATCH_SIZE, 0)
+        announced = set()
+        # (time, newest visible id) of recent polls; once a poll is older than
+        # the grace period, every id up to the one it saw has committed.
+        observed = deque([(loop.time(), newest)])
+        while True:
+            grace = get_grace_seconds()
+            after = scan_from
+            while True:
+                rows = [
+                    row async for row in Notification.objects.filter(id__gt=after)
+                    .order_by('id').values_list('id', 'recipient_id')[:BATCH_SIZE]
+                ]
+                for notification_id, recipient_id in rows:
+                    if notification_id not in announced:
+                        announced.add(notification_id)
+                        self._wake(recipient_id)
+                if rows:
+                    after = rows[-1][0]
+                if len(rows) < BATCH_SIZE:
+                    break
+            now = loop.time()
+            observed.append((now, max(after, observed[-1][1])))
+            while len(observed) > 1 and observed[1][0] <= now - grace:
+                observed.popleft()
+            if observed[0][0] <= now - grace and observed[0][1] > scan_from:
+                scan_from = self.committed_id = observed[0][1]
+                announced = {notification_id for notification_id in announced if notification_id > scan_from}
+            await asyncio.sleep(get_poll_interval())
+
+
+hub = NotificationHub()
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+
+from .dispatch import dispatch_all, enqueue, enqueue_many
+from .models import Notification, NotificationGroup, NotificationOutbox
+from .rollup import bucket_start, roll_up
+from .stream import MAX_SEEN, Cursor
+
+User = get_user_model()
+
+
+class NotificationDispatchTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.fan = User.objects.create_user(username="fan", email="fan@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+
+    def test_enqueue_does_not_create_notifications_inline(self):
+        enqueue(self.author, self.fan, "liked", target_post=self.post)
+
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_self_notifications_are_dropped(self):
+        enqueue(self.author, self.author, "liked", target_post=self.post)
+
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_dispatch_coalesces_duplicate_events(self):
+        enqueue_many([
+            (self.author.pk, self.fan.pk, "liked", self.post.pk),
+            (self.author.pk, self.fan.pk, "liked", self.post.pk),
+            (self.author.pk, self.fan.pk, "followed", None),
+        ])
+
+        self.assertEqual(dispatch_all(batch_size=2), (3, 2))
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 2)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_dispatch_command_drains_outbox(self):
+        enqueue(self.author, self.fan, "followed")
+        out = StringIO()
+
+        call_command("dispatch_notifications", "--once", stdout=out)
+
+        self.assertTrue(Notification.objects.filter(recipient=self.author, verb="followed").exists())
+        self.assertIn("Dispatched 1 event(s)", out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowNotificationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_enqueues_notification(self):
+        follower = User.objects.create_user(username="follower", email="follower@example.com")
+        followed = User.objects.create_user(username="followed", email="followed@example.com")
+        token = Token.objects.create(user=follower)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        self.client.post(reverse("follow-user", args=[followed.pk]))
+
+        self.assertTrue(NotificationOutbox.objects.filter(recipient=followed, actor=follower, verb="followed").exists())
+
+    def test_repeated_follow_does_not_notify_again(self):
+        follower = User.objects.create_user(username="follower", email="follower@example.com")
+        followed = User.objects.create_user(username="followed", email="followed@example.com")
+        token = Token.objects.create(user=follower)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        self.client.post(reverse("follow-user", args=[followed.pk]))
+        self.client.post(reverse("follow-user", args=[followed.pk]))
+
+        self.assertEqual(NotificationOutbox.objects.filter(recipient=followed, actor=follower, verb="followed").count(), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NotificationRollupTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+        self.fans = [User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com") for i in range(42)]
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_likes_roll_up_into_one_group(self):
+        enqueue_many((self.author.pk, fan.pk, "liked", self.post.pk) for fan in self.fans)
+        dispatch_all(batch_size=10)
+
+        group = NotificationGroup.objects.get(recipient=self.author, verb="liked", target_post=self.post)
+        self.assertEqual(group.actor_count, 42)
+        self.assertEqual(Notification.objects.filter(recipient=self.author).count(), 42)
+
+    def test_list_endpoint_serves_rollups(self):
+        enqueue_many((self.author.pk, fan.pk, "liked", self.post.pk) for fan in self.fans)
+        enqueue(self.author, self.fans[0], "followed")
+        dispatch_all()
+
+        response = self.client.get(reverse("notification-list"))
+
+        summaries = [group["summary"] for group in response.data["results"]]
+        self.assertEqual(len(summaries), 2)
+        self.assertIn("fan0 followed", summaries)
+        self.assertIn("and 41 others liked your post", " ".join(summaries))
+
+    def test_actor_count_counts_distinct_actors(self):
+        enqueue_many((self.author.pk, fan.pk, "commented", self.post.pk) for fan in self.fans[:3])
+        dispatch_all()
+        # The same people comment again in two later batches, with one newcomer.
+        for _ in range(2):
+            enqueue_many((self.author.pk, fan.pk, "commented", self.post.pk) for fan in self.fans[:4])
+            dispatch_all()
+
+        group = NotificationGroup.objects.get(recipient=self.author, verb="commented", target_post=self.post)
+        self.assertEqual(group.actor_count, 4)
+
+    def test_groups_without_a_post_are_unique(self):
+        enqueue(self.author, self.fans[0], "followed")
+        dispatch_all()
+        group = NotificationGroup.objects.get(recipient=self.author, verb="followed")
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            NotificationGroup.objects.create(
+                recipient=self.author, verb="followed", bucket_start=group.bucket_start,
+                latest_actor=self.fans[1], updated_at=group.updated_at,
+            )
+
+    @override_settings(NOTIFICATION_ROLLUP_BUCKET_SECONDS=60)
+    def test_rollup_buckets_are_time_bounded(self):
+        first = Notification.objects.create(recipient=self.author, actor=self.fans[0], verb="liked", target_post=self.post)
+        second = Notification.objects.create(recipient=self.author, actor=self.fans[1], verb="liked", target_post=self.post)
+        second.timestamp = first.timestamp + timedelta(minutes=5)
+        roll_up([first, second])
+
+        self.assertEqual(NotificationGroup.objects.count(), 2)
+        self.assertEqual(bucket_start(first.timestamp).second, 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AsyncNotificationListTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+        for i in range(3):
+            fan = User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com")
+            roll_up([Notification.objects.create(recipient=self.author, actor=fan, verb="liked", target_post=self.post)])
+        enqueue(self.author, fan, "followed")
+        dispatch_all()
+        self.headers = {"authorization": f"Token {Token.objects.create(user=self.author).key}"}
+
+    async def test_matches_sync_list(self):
+        response = await self.async_client.get(reverse("notification-list-async"), headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        sync_response = await self.async_client.get(reverse("notification-list"), headers=self.headers)
+        self.assertEqual(response.json(), sync_response.json())
+        self.assertEqual(len(response.json()["results"]), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UnreadNotificationTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+        for i in range(3):
+            fan = User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com")
+            enqueue(self.author, fan, "liked", self.post)
+        dispatch_all()
+        self.ids = list(Notification.objects.filter(recipient=self.author).order_by("id").values_list("id", flat=True))
+        token = Token.objects.create(user=self.author)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_dispatch_counts_unread(self):
+        response = self.client.get(reverse("notification-unread-count"))
+        self.assertEqual(response.json(), {"unread_count": 3})
+
+    def test_mark_read_up_to_cursor(self):
+        response = self.client.post(reverse("notification-mark-read"), {"up_to": self.ids[1]})
+        self.assertEqual(response.json(), {"marked": 2, "unread_count": 1})
+        self.assertEqual(list(Notification.objects.filter(read=False).values_list("id", flat=True)), [self.ids[2]])
+
+        response = self.client.post(reverse("notification-mark-read"))
+        self.assertEqual(response.json(), {"marked": 1, "unread_count": 0})
+        response = self.client.post(reverse("notification-mark-read"))
+        self.assertEqual(response.json(), {"marked": 0, "unread_count": 0})
+
+    def test_mark_read_rejects_bad_cursor(self):
+        response = self.client.post(reverse("notification-mark-read"), {"up_to": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reconcile_repairs_drift(self):
+        User.objects.filter(pk=self.author.pk).update(unread_notification_count=42)
+        Notification.objects.filter(pk=self.ids[0]).update(read=True)
+        call_command("reconcile_unread_counts", stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.unread_notification_count, 2)
+
+
+class NotificationRetentionTestCase(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+        for i in range(5):
+            fan = User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com")
+            enqueue(self.author, fan, "liked", self.post)
+        dispatch_all()
+        ids = list(Notification.objects.order_by("id").values_list("id", flat=True))
+        self.old_ids = ids[:3]
+        old = timezone.now() - timedelta(days=100)
+        Notification.objects.filter(id__in=self.old_ids).update(timestamp=old)
+        Notification.objects.filter(id=self.old_ids[0]).update(read=True)
+        User.objects.filter(pk=self.author.pk).update(unread_notification_count=4)
+        NotificationGroup.objects.update(updated_at=old)
+
+    def test_prunes_in_batches_and_archives(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as archive_dir:
+            call_command("prune_notifications", older_than=90, batch_size=2, archive_dir=archive_dir, stdout=out)
+            [name] = os.listdir(archive_dir)
+            with gzip.open(os.path.join(archive_dir, name), "rt") as f:
+                archived = [json.loads(line) for line in f]
+
+        self.assertEqual([row["id"] for row in archived], self.old_ids)
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertFalse(Notification.objects.filter(id__in=self.old_ids).exists())
+        self.assertEqual(NotificationGroup.objects.count(), 0)
+        self.author.refresh_from_db()
+        # Two of the three deleted notifications were unread.
+        self.assertEqual(self.author.unread_notification_count, 2)
+        self.assertIn("Removed 3 notification(s) and 1 group(s)", out.getvalue())
+        self.assertIn("rows/s", out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        out = StringIO()
+        call_command("prune_notifications", older_than=90, dry_run=True, stdout=out)
+        self.assertIn("Would remove 3 notification(s) and 1 group(s)", out.getvalue())
+        self.assertEqual(Notification.objects.count(), 5)
+
+
+# The duplicate-query middleware is sync: it would run these views on a thread
+# of their own and count the hub's polling against the request.
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    DUPLICATE_QUERY_DETECTION=None,
+    NOTIFICATION_STREAM_POLL_INTERVAL=0.01,
+    NOTIFICATION_STREAM_MAX_SECONDS=0.5,
+)
+class NotificationStreamTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.fan = User.objects.create_user(username="fan", email="fan@example.com")
+        self.post = Post.objects.create(title="Post", content="...", author=self.author)
+        self.first = Notification.objects.create(recipient=self.author, actor=self.fan, verb="liked", target_post=self.post)
+        # Someone else's notification is never delivered.
+        Notification.objects.create(recipient=self.fan, actor=self.author, verb="followed")
+        self.headers = {"authorization": f"Token {Token.objects.create(user=self.author).key}"}
+        self.url = reverse("notification-stream")
+
+    def notify(self):
+        return Notification.objects.acreate(recipient=self.author, actor=self.fan, verb="commented", target_post=self.post)
+
+    async def read_events(self, response, until=None):
+        """Notification ids of the stream, calling ``until`` once the backlog has been read."""
+        ids = []
+        async for chunk in response.streaming_content:
+            for line in chunk.decode().splitlines():
+                if line.startswith("data: "):
+                    ids.append(json.loads(line[6:])["id"])
+            if until is not None and ids:
+                await until()
+                until = None
+        return ids
+
+    async def test_stream_replays_backlog_then_delivers_new_notifications(self):
+        response = await self.async_client.get(
+            self.url, {"since": 0}, headers={**self.headers, "accept": "text/event-stream"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        created = []
+
+        async def create():
+            created.append(await self.notify())
+
+        ids = await self.read_events(response, until=create)
+        self.assertEqual(ids, [self.first.id, created[0].id])
+
+    async def test_stream_delivers_rows_committed_out_of_order(self):
+        # Another dispatcher took the lower id first but commits after this
+        # stream has already delivered the higher one.
+        higher = await Notification.objects.acreate(
+            id=self.first.id + 10, recipient=self.author, actor=self.fan, verb="commented", target_post=self.post,
+        )
+        response = await self.async_client.get(
+            self.url, {"since": self.first.id}, headers={**self.headers, "accept": "text/event-stream"},
+        )
+        created = []
+
+        async def commit_lower():
+            created.append(await Notification.objects.acreate(
+                id=self.first.id + 5, recipient=self.author, actor=self.fan, verb="commented", target_post=self.post,
+            ))
+
+        ids = await self.read_events(response, until=commit_lower)
+        self.assertEqual(ids, [higher.id, created[0].id])
+
+    async def test_stream_resumes_after_last_event_id(self):
+        second = await self.notify()
+        response = await self.async_client.get(
+            self.url, headers={**self.headers, "accept": "text/event-stream", "last-event-id": str(self.first.id)},
+        )
+        self.assertEqual(await self.read_events(response), [second.id])
+
+    async def test_resume_skips_ids_delivered_above_the_floor(self):
+        second = await self.notify()
+        third = await self.notify()
+        response = await self.async_client.get(
+            self.url, headers={**self.headers, "accept": "text/event-stream", "last-event-id": f"0:{self.first.id},{third.id}"},
+        )
+        self.assertEqual(await self.read_events(response), [second.id])
+
+    def test_event_stream_falls_back_to_long_poll_under_wsgi(self):
+        # Django would buffer the whole stream before sending any of it.
+        response = self.client.get(
+            self.url, {"since": self.first.id, "timeout": 0}, headers={**self.headers, "accept": "text/event-stream"},
+        )
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["results"], [])
+
+    async def test_long_poll_waits_for_next_notification(self):
+        response = await self.async_client.get(self.url, headers=self.headers)
+        self.assertEqual(response.json(), {"cursor": f"0:{self.first.id}", "results": []})
+
+        async def create_later():
+            await asyncio.sleep(0.05)
+            return await self.notify()
+
+        task = asyncio.ensure_future(create_later())
+        response = await self.async_client.get(self.url, {"since": response.json()["cursor"], "timeout": 5}, headers=self.headers)
+        second = await task
+        self.assertEqual(response.json()["cursor"], f"0:{self.first.id},{second.id}")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [second.id])
+
+    async def test_long_poll_times_out_empty(self):
+        response = await self.async_client.get(self.url, {"since": self.first.id, "timeout": 0.05}, headers=self.headers)
+        self.assertEqual(response.json(), {"cursor": str(self.first.id), "results": []})
+
+    @mock.patch("notifications.stream.BATCH_SIZE", 2)
+    @mock.patch("notifications.views.BATCH_SIZE", 2)
+    async def test_backlog_is_read_a_batch_at_a_time(self):
+        created = [await self.notify() for _ in range(3)]
+        response = await self.async_client.get(self.url, {"since": 0, "timeout": 0}, headers=self.headers)
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.first.id, created[0].id])
+
+        response = await self.async_client.get(self.url, {"since": response.json()["cursor"], "timeout": 0}, headers=self.headers)
+        self.assertEqual([row["id"] for row in response.json()["results"]], [row.id for row in created[1:]])
+
+        response = await self.async_client.get(
+            self.url, {"since": 0}, headers={**self.headers, "accept": "text/event-stream"},
+        )
+        self.assertEqual(await self.read_events(response), [self.first.id, *[row.id for row in created]])
+
+    def test_parsed_cursor_keeps_at_most_max_seen_ids(self):
+        cursor = Cursor.parse("5:" + ",".join(str(i) for i in range(6, 6 + MAX_SEEN + 50)))
+        self.assertEqual(len(cursor.seen), MAX_SEEN)
+        self.assertEqual(min(cursor.seen), 56)
+
+    async def test_rejects_malformed_cursor(self):
+        response = await self.async_client.get(self.url, {"since": "1:x"}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,75 @@
+"""
+Unread notification counts.
+
+User.unread_notification_count mirrors the number of unread notifications of
+each user, so a badge count is a primary-key read instead of a count over
+the inbox. record_created() raises it as the dispatcher inserts
+notifications, and mark_read() and record_deleted() lower it by the number
+of rows flipped or removed, in the same transaction as the write they
+account for.
+"""
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Notification
+
+User = get_user_model()
+
+
+def _group_by_count(recipient_ids):
+    """{count: recipients appearing that many times}, for one UPDATE per distinct count."""
+    grouped = defaultdict(list)
+    for recipient_id, count in Counter(recipient_ids).items():
+        grouped[count].append(recipient_id)
+    return grouped.items()
+
+
+def record_created(notifications):
+    """Count freshly created (unread) notifications against their recipients."""
+    for increment, recipient_ids in _group_by_count(n.recipient_id for n in notifications):
+        User.objects.filter(pk__in=recipient_ids).update(
+            unread_notification_count=F('unread_notification_count') + increment,
+        )
+
+
+def record_deleted(recipient_ids):
+    """Uncount deleted unread notifications; ``recipient_ids`` has one entry per row."""
+    for decrement, ids in _group_by_count(recipient_ids):
+        User.objects.filter(pk__in=ids).update(
+            unread_notification_count=Greatest(F('unread_notification_count') - decrement, 0),
+        )
+
+
+def mark_read(recipient_id, up_to=None):
+    """
+    Mark the recipient's notifications with ids up to ``up_to`` (all of them
+    when None) read with a single UPDATE. Returns (marked, still unread).
+    """
+    with transaction.atomic():
+        unread = Notification.objects.filter(recipient_id=recipient_id, read=False)
+        if up_to is not None:
+            unread = unread.filter(id__lte=up_to)
+        marked = unread.update(read=True)
+        if marked:
+            User.objects.filter(pk=recipient_id).update(
+                unread_notification_count=Greatest(F('unread_notification_count') - marked, 0),
+            )
+        return marked, unread_count(recipient_id)
+
+
+def unread_count(recipient_id):
+    # Read from the table: request.user may come from the authentication cache.
+    return User.objects.filter(pk=recipient_id).values_list('unread_notification_count', flat=True).first() or 0
+
+
+def recount_unread(user_ids=None):
+    """Reset unread_notification_count from the notifications table, for ``user_ids`` or everyone."""
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    rows = Notification.objects.filter(recipient=OuterRef('pk'), read=False).order_by().values('recipient')
+    return users.update(
+        unread_notification_count=Coalesce(Subquery(rows.annotate(total=Count('*')).values('total')), 0),
+    )
@@ -1,6 +1,16 @@
 from django.urls import path
-from .views import NotificationListView
+from .views import (
+    AsyncNotificationListView,
+    MarkReadView,
+    NotificationListView,
+    NotificationStreamView,
+    UnreadCountView,
+)
 
 urlpatterns = [
-    path('/notafications', NotificationListView.as_view(), name='notification-list'),
+    path('', NotificationListView.as_view(), name='notification-list'),
+    path('async/', AsyncNotificationListView.as_view(), name='notification-list-async'),
+    path('unread-count/', UnreadCountView.as_view(), name='notification-unread-count'),
+    path('mark-read/', MarkReadView.as_view(), name='notification-mark-read'),
+    path('stream/', NotificationStreamView.as_view(), name='notification-stream'),
 ]
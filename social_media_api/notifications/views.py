@@ -1,10 +1,166 @@
-from rest_framework import generics, permissions
-from .models import Notification
-from .serializers import NotificationSerializer
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions, generics, permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from accounts.authentication import CachedTokenAuthentication
+
+from social_media_api.asyncapi import AsyncAPIView
+from social_media_api.pagination import KeysetPagination
+from .models import Notification, NotificationGroup
+from .serializers import MarkReadSerializer, NotificationEventSerializer, NotificationGroupSerializer
+from .stream import BATCH_SIZE, Cursor, acurrent_cursor, aundelivered, hub
+from .unread import mark_read, unread_count
 
 class NotificationListView(generics.ListAPIView):
-    serializer_class = NotificationSerializer
+    """
+    The recipient's inbox, one row per rolled-up group of notifications,
+    most recently active first.
+    """
+    serializer_class = NotificationGroupSerializer
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-updated_at', '-id')
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user).order_by('-timestamp')
+        return NotificationGroup.objects.filter(recipient=self.request.user).select_related('latest_actor')
+
+
+class UnreadCountView(APIView):
+    """Number of unread notifications, for badge counts."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({'unread_count': unread_count(request.user.pk)})
+
+
+class MarkReadView(APIView):
+    """
+    Mark the recipient's notifications read, up to the id in ``up_to`` (for
+    example the id of the newest notification received) or all of them.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        marked, unread = mark_read(request.user.pk, serializer.validated_data.get('up_to'))
+        return Response({'marked': marked, 'unread_count': unread})
+
+
+class AsyncNotificationListView(AsyncAPIView):
+    """NotificationListView read with the async ORM."""
+    keyset_ordering = NotificationListView.keyset_ordering
+
+    async def get(self, request):
+        paginator = KeysetPagination()
+        groups = NotificationGroup.objects.filter(recipient=request.user).select_related('latest_actor')
+        page = await paginator.apaginate_queryset(groups, request, view=self)
+        data = NotificationGroupSerializer(page, many=True).data
+        return JsonResponse({'next': paginator.get_next_link(), 'results': data})
+
+
+class NotificationStreamView(AsyncAPIView):
+    """
+    New notifications of the recipient as they are created.
+
+    Clients that accept text/event-stream get server-sent events, one per
+    notification with the stream's cursor as the event id, and a comment
+    line every NOTIFICATION_STREAM_HEARTBEAT seconds. The stream is closed
+    after NOTIFICATION_STREAM_MAX_SECONDS; EventSource reconnects with
+    Last-Event-ID and misses nothing. Django buffers a streaming response
+    whole when served over WSGI, so event streams need the ASGI entry point;
+    under WSGI these clients are long-polled instead.
+
+    Other clients long-poll: the response holds until a notification after
+    the ``?since=`` cursor arrives or NOTIFICATION_LONGPOLL_TIMEOUT seconds
+    pass. It returns at most one batch of notifications, and ``cursor`` in
+    the body is the cursor for the next request.
+    """
+
+    async def get(self, request):
+        cursor = self.get_cursor(request)
+        if 'text/event-stream' in request.headers.get('Accept', '') and isinstance(request._request, ASGIRequest):
+            response = StreamingHttpResponse(self.event_stream(request.user.pk, cursor), content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            # Keep reverse proxies from buffering the events.
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        return await self.long_poll(request, cursor)
+
+    def get_cursor(self, request):
+        value = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        if value is None:
+            return None
+        try:
+            return Cursor.parse(value)
+        except ValueError:
+            raise exceptions.ValidationError({'since': 'Must be a stream cursor.'})
+
+    def get_timeout(self, request):
+        limit = getattr(settings, 'NOTIFICATION_LONGPOLL_TIMEOUT', 25)
+        try:
+            return min(max(float(request.query_params.get('timeout', limit)), 0), limit)
+        except ValueError:
+            raise exceptions.ValidationError({'timeout': 'Must be a number of seconds.'})
+
+    async def event_stream(self, recipient_id, cursor):
+        # Subscribe before reading anything so that nothing created in
+        # between is missed; the cursor skips what was already delivered.
+        subscription = hub.subscribe(recipient_id)
+        try:
+            yield 'retry: 3000\n\n'
+            if cursor is None:
+                cursor = await acurrent_cursor(recipient_id)
+            heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + getattr(settings, 'NOTIFICATION_STREAM_MAX_SECONDS', 300)
+            while True:
+                notifications, committed_id = await aundelivered(recipient_id, cursor)
+                for notification in notifications:
+                    cursor.mark(notification.id)
+                    yield format_event(notification, cursor)
+                cursor.advance(committed_id)
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                if len(notifications) == BATCH_SIZE:
+                    continue  # more backlog to send before waiting
+                if not await subscription.wait(min(heartbeat, remaining)):
+                    yield ': keepalive\n\n'
+        finally:
+            hub.unsubscribe(subscription)
+
+    async def long_poll(self, request, cursor):
+        recipient_id = request.user.pk
+        if cursor is None:
+            # No cursor yet: hand out the current one without waiting.
+            return JsonResponse({'cursor': str(await acurrent_cursor(recipient_id)), 'results': []})
+
+        subscription = hub.subscribe(recipient_id)
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.get_timeout(request)
+            notifications, committed_id = await aundelivered(recipient_id, cursor)
+            # A wake-up only means there may be something new.
+            while not notifications and await subscription.wait(max(deadline - loop.time(), 0)):
+                notifications, committed_id = await aundelivered(recipient_id, cursor)
+        finally:
+            hub.unsubscribe(subscription)
+        for notification in notifications:
+            cursor.mark(notification.id)
+        cursor.advance(committed_id)
+        data = NotificationEventSerializer(notifications, many=True).data
+        return JsonResponse({'cursor': str(cursor), 'results': data})
+
+
+def format_event(notification, cursor):
+    data = json.dumps(NotificationEventSerializer(notification).data)
+    return f'id: {cursor}\nevent: notification\ndata: {data}\n\n'
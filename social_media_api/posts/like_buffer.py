@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for likes on hot posts.
+
+Likes on posts with at least LIKE_BUFFER_HOT_THRESHOLD likes are not
+written in the request. They are queued in this process, deduplicated, and
+flushed in bulk once LIKE_BUFFER_FLUSH_INTERVAL seconds have passed or
+LIKE_BUFFER_MAX_PENDING likes are waiting. Flushes run after a response has
+been sent (request_finished) and at interpreter exit, so the liking request
+never waits on the Like table or its unique index.
+
+Pending likes are visible to the process that accepted them, which gives the
+liking user read-your-own-write behaviour for duplicate likes and unlikes.
+"""
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F
+
+from notifications.dispatch import enqueue_many
+
+from .models import Like, Post
+from .response_cache import invalidate_posts
+
+User = get_user_model()
+
+FLUSH_BATCH_SIZE = 500
+
+
+def get_hot_threshold():
+    return getattr(settings, 'LIKE_BUFFER_HOT_THRESHOLD', 1000)
+
+
+def is_hot(post):
+    return post.like_count >= get_hot_threshold()
+
+
+class LikeBuffer:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+
+    def add(self, user_id, post_id):
+        """Queue a like. Returns False if the same like is already pending."""
+        with self._lock:
+            if (user_id, post_id) in self._pending:
+                return False
+            self._pending[(user_id, post_id)] = None
+            return True
+
+    def discard(self, user_id, post_id):
+        """Drop a pending like. Returns False if it was not pending."""
+        with self._lock:
+            if (user_id, post_id) not in self._pending:
+                return False
+            del self._pending[(user_id, post_id)]
+            return True
+
+    def is_pending(self, user_id, post_id):
+        with self._lock:
+            return (user_id, post_id) in self._pending
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def is_due(self):
+        interval = getattr(settings, 'LIKE_BUFFER_FLUSH_INTERVAL', 2.0)
+        max_pending = getattr(settings, 'LIKE_BUFFER_MAX_PENDING', 500)
+        with self._lock:
+            if not self._pending:
+                return False
+            return len(self._pending) >= max_pending or time.monotonic() - self._last_flush >= interval
+
+    def flush_if_due(self):
+        if self.is_due():
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Write all pending likes. Returns the number of new Like rows."""
+        with self._lock:
+            pairs = list(self._pending)
+            self._pending = {}
+            self._last_flush = time.monotonic()
+        if not pairs:
+            return 0
+        try:
+            return self._write(pairs)
+        except Exception:
+            # Nothing was committed; keep the likes for the next flush.
+            with self._lock:
+                for pair in pairs:
+                    self._pending.setdefault(pair, None)
+            raise
+
+    def _write(self, pairs):
+        post_ids = {post_id for _, post_id in pairs}
+        authors = dict(Post.objects.filter(pk__in=post_ids).values_list('pk', 'author_id'))
+        users = set(User.objects.filter(pk__in={user_id for user_id, _ in pairs}).values_list('pk', flat=True))
+        # The post or the user may have been deleted while the like was pending.
+        pairs = [(user_id, post_id) for user_id, post_id in pairs if post_id in authors and user_id in users]
+        if not pairs:
+            return 0
+
+        with transaction.atomic():
+            inserted = insert_likes(pairs)
+            for post_id, added in Counter(post_id for _, post_id in inserted).items():
+                Post.objects.filter(pk=post_id).update(like_count=F('like_count') + added)
+            enqueue_many(
+                (authors[post_id], user_id, "liked", post_id)
+                for user_id, post_id in inserted
+            )
+            if inserted:
+                invalidate_posts({post_id for _, post_id in inserted})
+        return len(inserted)
+
+
+def insert_likes(pairs):
+    """
+    Insert (user_id, post_id) likes, skipping ones that already exist, and
+    return the pairs that were actually inserted. The database reports them
+    (INSERT ... ON CONFLICT DO NOTHING RETURNING), so likes written
+    concurrently by the request path are neither counted nor notified twice.
+    """
+    table = connection.ops.quote_name(Like._meta.db_table)
+    user_column = connection.ops.quote_name(Like._meta.get_field('user').column)
+    post_column = connection.ops.quote_name(Like._meta.get_field('post').column)
+    inserted = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), FLUSH_BATCH_SIZE):
+            batch = pairs[start:start + FLUSH_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({user_column}, {post_column}) "
+                f"VALUES {', '.join(['(%s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({user_column}, {post_column}) DO NOTHING "
+                f"RETURNING {user_column}, {post_column}",
+                [value for pair in batch for value in pair],
+            )
+            inserted += [tuple(row) for row in cursor.fetchall()]
+    return inserted
+
+
+like_buffer = LikeBuffer()
+atexit.register(like_buffer.flush)
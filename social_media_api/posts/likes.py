@@ -0,0 +1,44 @@
+"""
+Liking and unliking posts, shared by the sync and async endpoints.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from notifications.dispatch import enqueue as enqueue_notification
+
+from .like_buffer import is_hot, like_buffer
+from .models import Like, Post
+
+
+def like_post(user, post):
+    """Like ``post`` as ``user``. Returns False if they already liked it."""
+    if is_hot(post):
+        # Hot posts take likes through the write-behind buffer.
+        if Like.objects.filter(user=user, post=post).exists():
+            return False
+        # add() checks and queues under the buffer's lock, so of two
+        # concurrent likes only one is accepted.
+        return like_buffer.add(user.pk, post.pk)
+
+    with transaction.atomic():
+        like, created = Like.objects.get_or_create(user=user, post=post)
+        if not created:
+            return False
+        Post.objects.filter(pk=post.pk).update(like_count=F('like_count') + 1)
+
+        enqueue_notification(post.author, user, "liked", target_post=post)
+    return True
+
+
+def unlike_post(user, post):
+    """Remove ``user``'s like of ``post``. Returns False if there was none."""
+    if like_buffer.discard(user.pk, post.pk):
+        return True
+
+    with transaction.atomic():
+        # Only the request whose DELETE removed the row decrements, however
+        # many race to unlike.
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            Post.objects.filter(pk=post.pk, like_count__gt=0).update(like_count=F('like_count') - 1)
+    return bool(deleted)
@@ -0,0 +1,171 @@
+"""
+Synthetic social graph generator used by the seed_social_graph, benchmark_api
+and explain_queries commands.
+
+Popularity follows a power law: every generated user gets a Pareto-distributed
+weight, and followers, posts and likes are drawn in proportion to it. A few
+accounts end up with a large share of the followers and likes, like a real
+network. Everything is written with bulk inserts in fixed-size batches.
+"""
+import random
+from dataclasses import dataclass
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from accounts.follows import recount_follow_counters
+from notifications.models import Notification
+from notifications.rollup import roll_up
+from notifications.unread import record_created
+
+from . import search
+from .models import Comment, Like, Post, TimelineEntry
+from .response_cache import POST_LIST, invalidate
+from .timeline import get_fanout_threshold
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+
+
+@dataclass
+class GraphStats:
+    users: int = 0
+    follows: int = 0
+    posts: int = 0
+    comments: int = 0
+    likes: int = 0
+    timeline_entries: int = 0
+    notifications: int = 0
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_social_graph(users, posts_per_user=10, follows_per_user=20, likes_per_post=5,
+                          comments_per_post=1, alpha=1.2, prefix='load', seed=None, notifications=True,
+                          log=None):
+    """
+    Create ``users`` accounts and a power-law follow graph with posts,
+    comments, likes, materialized timelines and (optionally) notifications.
+    Returns a GraphStats with the number of rows written per table.
+    """
+    rng = random.Random(seed)
+    stats = GraphStats()
+    log = log or (lambda message: None)
+
+    with transaction.atomic():
+        start_user = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        for batch in _batched(
+            User(username=f'{prefix}-{start_user + i}', email=f'{prefix}-{start_user + i}@example.com', password='!')
+            for i in range(users)
+        ):
+            User.objects.bulk_create(batch)
+            stats.users += len(batch)
+        user_ids = list(User.objects.filter(pk__gt=start_user).order_by('pk').values_list('pk', flat=True))
+        weights = [rng.paretovariate(alpha) for _ in user_ids]
+        cum_weights = list(accumulate(weights))
+        log(f"Created {stats.users} users")
+
+        def popular_users(k):
+            return rng.choices(user_ids, cum_weights=cum_weights, k=k)
+
+        Follow = User.following.through
+        follows = (
+            Follow(from_user_id=follower_id, to_user_id=followee_id)
+            for follower_id in user_ids
+            for followee_id in set(popular_users(rng.randint(1, 2 * follows_per_user)))
+            if followee_id != follower_id
+        )
+        for batch in _batched(follows):
+            Follow.objects.bulk_create(batch, ignore_conflicts=True)
+            stats.follows += len(batch)
+        recount_follow_counters(user_ids)
+        log(f"Created {stats.follows} follows")
+
+        start_post = Post.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        posts = (
+            Post(title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * rng.randint(1, 10), author_id=author_id)
+            for i, author_id in enumerate(popular_users(users * posts_per_user))
+        )
+        for batch in _batched(posts):
+            Post.objects.bulk_create(batch)
+            stats.posts += len(batch)
+        created_posts = list(Post.objects.filter(pk__gt=start_post).order_by('pk').values_list('pk', 'author_id'))
+        log(f"Created {stats.posts} posts")
+
+        comments = (
+            Comment(content='Nice post!', author_id=rng.choice(user_ids), post_id=post_id)
+            for post_id, _ in created_posts
+            for _ in range(rng.randint(0, 2 * comments_per_post))
+        )
+        for batch in _batched(comments):
+            Comment.objects.bulk_create(batch)
+            stats.comments += len(batch)
+        log(f"Created {stats.comments} comments")
+
+        # bulk_create skips the signals that keep the search index current.
+        search.reindex(Post, Post.objects.filter(pk__gt=start_post))
+        search.reindex(Comment, Comment.objects.filter(post_id__gt=start_post))
+
+        author_weight = dict(zip(user_ids, weights))
+        post_weights = list(accumulate(author_weight[author_id] for _, author_id in created_posts))
+        liked = rng.choices(created_posts, cum_weights=post_weights, k=len(created_posts) * likes_per_post)
+        likes = {(rng.choice(user_ids), post_id): author_id for post_id, author_id in liked}
+        for batch in _batched(Like(user_id=user_id, post_id=post_id) for user_id, post_id in likes):
+            Like.objects.bulk_create(batch, ignore_conflicts=True)
+            stats.likes += len(batch)
+        Post.objects.filter(pk__gt=start_post).recount()
+        invalidate(POST_LIST)
+        log(f"Created {stats.likes} likes")
+
+        stats.timeline_entries = _materialize_timelines(start_post)
+        log(f"Created {stats.timeline_entries} timeline entries")
+
+        if notifications:
+            events = (
+                Notification(recipient_id=author_id, actor_id=user_id, verb='liked', target_post_id=post_id)
+                for (user_id, post_id), author_id in likes.items()
+                if user_id != author_id
+            )
+            for batch in _batched(events):
+                created = Notification.objects.bulk_create(batch)
+                roll_up(created)
+                record_created(created)
+                stats.notifications += len(batch)
+            log(f"Created {stats.notifications} notifications")
+
+    return stats
+
+
+def _materialize_timelines(start_post):
+    """
+    Fan out every generated post to its author's followers in one
+    INSERT ... SELECT, skipping authors above the fan-out threshold just like
+    posts.timeline.fan_out_post does, and mark those posts fanned out.
+    """
+    user_table = connection.ops.quote_name(User._meta.db_table)
+    timeline_table = connection.ops.quote_name(TimelineEntry._meta.db_table)
+    post_table = connection.ops.quote_name(Post._meta.db_table)
+    follow_table = connection.ops.quote_name(User.following.through._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {timeline_table} (user_id, post_id, created_at) "
+            f"SELECT f.from_user_id, p.id, p.created_at FROM {post_table} p "
+            f"JOIN {follow_table} f ON f.to_user_id = p.author_id "
+            f"JOIN {user_table} a ON a.id = p.author_id "
+            f"WHERE p.id > %s AND a.follower_count <= %s",
+            [start_post, get_fanout_threshold()],
+        )
+        created = cursor.rowcount
+    Post.objects.filter(pk__gt=start_post, author__follower_count__lte=get_fanout_threshold()).update(fanned_out=True)
+    return created
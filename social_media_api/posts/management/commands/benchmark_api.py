@@ -0,0 +1,140 @@
+import json
+import math
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from posts.models import Post
+
+User = get_user_model()
+
+ENDPOINTS = ('feed', 'post-list', 'like', 'notification-list')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the feed, post list, like and notification endpoints through the "
+        "test client and report latency percentiles and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per endpoint (default: 200).")
+        parser.add_argument('--warmup', type=int, default=10, help="Unmeasured requests per endpoint (default: 10).")
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, dest='endpoints',
+                            help="Endpoint to benchmark (repeatable, default: all).")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for choosing users and posts.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--keep-writes', action='store_true',
+                            help="Commit the likes and tokens created while benchmarking.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.client = APIClient()
+
+        with override_settings(ALLOWED_HOSTS=['testserver'], SECURE_SSL_REDIRECT=False), transaction.atomic():
+            readers = list(
+                User.objects.annotate(num_following=Count('following')).filter(num_following__gt=0)
+                .order_by('-num_following').values_list('pk', flat=True)[:100]
+            )
+            post_ids = list(Post.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+            if not readers or not post_ids:
+                raise CommandError("No data to benchmark; run `manage.py seed_social_graph` first.")
+            authors = list(Post.objects.filter(pk__in=post_ids).values_list('author_id', flat=True).distinct()[:100])
+            self.tokens = {
+                user_id: Token.objects.get_or_create(user_id=user_id)[0].key
+                for user_id in set(readers) | set(authors)
+            }
+            self.readers = readers
+            self.authors = authors
+            self.post_ids = post_ids
+
+            results = {}
+            for name in options['endpoints'] or ENDPOINTS:
+                make_request = getattr(self, 'request_' + name.replace('-', '_'))
+                for _ in range(options['warmup']):
+                    make_request()
+                results[name] = self.measure(make_request, options['requests'])
+
+            if not options['keep_writes']:
+                transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'generated_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'requests_per_endpoint': options['requests'],
+                'users': User.objects.count(),
+                'posts': Post.objects.count(),
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote report to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def measure(self, make_request, count):
+        latencies = []
+        query_counts = []
+        statuses = Counter()
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = make_request()
+                latencies.append((time.perf_counter() - started) * 1000)
+            query_counts.append(len(queries))
+            statuses[str(response.status_code)] += 1
+
+        latencies.sort()
+        return {
+            'requests': count,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'mean_ms': round(sum(latencies) / count, 3),
+            'queries': {
+                'mean': round(sum(query_counts) / count, 2),
+                'max': max(query_counts),
+            },
+            'status_codes': dict(statuses),
+        }
+
+    def as_user(self, user_id):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.tokens[user_id]}")
+
+    def request_feed(self):
+        self.as_user(self.rng.choice(self.readers))
+        return self.client.get(reverse('feed'))
+
+    def request_post_list(self):
+        self.client.credentials()
+        return self.client.get(reverse('post-list'))
+
+    def request_like(self):
+        self.as_user(self.rng.choice(self.readers))
+        return self.client.post(reverse('like-post', args=[self.rng.choice(self.post_ids)]))
+
+    def request_notification_list(self):
+        self.as_user(self.rng.choice(self.authors))
+        return self.client.get(reverse('notification-list'))
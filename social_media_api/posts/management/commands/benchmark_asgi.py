@@ -0,0 +1,187 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from posts.management.commands.benchmark_api import percentile
+from posts.models import Like, Post
+
+User = get_user_model()
+
+# Sync and async URL names of each endpoint. A "like" is a like followed by
+# an unlike of a post the user had not liked, so only the queued like
+# notifications are left behind.
+ENDPOINTS = {
+    'feed': (('feed',), ('feed-async',)),
+    'notification-list': (('notification-list',), ('notification-list-async',)),
+    'like': (('like-post', 'unlike-post'), ('like-post-async', 'unlike-post-async')),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (DRF) and async variants of the feed, notification and like "
+        "endpoints under concurrent requests through the ASGI application, reporting "
+        "throughput and latency percentiles as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per variant (default: 200).")
+        parser.add_argument('--concurrency', type=int, default=20, help="Requests in flight at once (default: 20).")
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, dest='endpoints',
+                            help="Endpoint to benchmark (repeatable, default: all).")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for choosing users and posts.")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        # Imported here so the ASGI handler is only built when benchmarking.
+        from social_media_api.asgi import application
+
+        self.rng = random.Random(options['seed'])
+        readers = list(
+            User.objects.annotate(num_following=Count('following')).filter(num_following__gt=0)
+            .order_by('-num_following').values_list('pk', flat=True)[:100]
+        )
+        post_ids = list(Post.objects.order_by('-pk').values_list('pk', flat=True)[:1000])
+        if not readers or not post_ids:
+            raise CommandError("No data to benchmark; run `manage.py seed_social_graph` first.")
+        authors = list(Post.objects.filter(pk__in=post_ids).values_list('author_id', flat=True).distinct()[:100])
+        # Requests run on other threads and connections, so these tokens are committed.
+        tokens = {
+            user_id: Token.objects.get_or_create(user_id=user_id)[0].key
+            for user_id in set(readers) | set(authors)
+        }
+        self.users = {'feed': readers, 'notification-list': authors, 'like': readers}
+        self.tokens = tokens
+        self.post_ids = post_ids
+        self.used_likes = set(
+            Like.objects.filter(user_id__in=readers, post_id__in=post_ids).values_list('user_id', 'post_id')
+        )
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name in options['endpoints'] or ENDPOINTS:
+                sync_names, async_names = ENDPOINTS[name]
+                results[name] = {
+                    variant: async_to_sync(self.measure)(
+                        application, name, url_names, options['requests'], options['concurrency'],
+                    )
+                    for variant, url_names in (('sync', sync_names), ('async', async_names))
+                }
+
+        report = {
+            'meta': {
+                'generated_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'requests_per_variant': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote report to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def build_requests(self, name, url_names):
+        """The (method, path, token) of each request in one unit of work."""
+        if name == 'like':
+            user_id, post_id = self.next_like()
+            return [('POST', reverse(url_name, args=[post_id]), self.tokens[user_id]) for url_name in url_names]
+        token = self.tokens[self.rng.choice(self.users[name])]
+        return [('GET', reverse(url_name), token) for url_name in url_names]
+
+    def next_like(self):
+        """A (user, post) pair that has not been liked before or during this run."""
+        if len(self.used_likes) >= len(self.users['like']) * len(self.post_ids):
+            raise CommandError("Every reader has liked every post; seed more data or send fewer requests.")
+        while True:
+            pair = (self.rng.choice(self.users['like']), self.rng.choice(self.post_ids))
+            if pair not in self.used_likes:
+                self.used_likes.add(pair)
+                return pair
+
+    async def measure(self, application, name, url_names, count, concurrency):
+        latencies = []
+        statuses = Counter()
+        remaining = count
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                requests = self.build_requests(name, url_names)
+                remaining -= len(requests)
+                for method, path, token in requests:
+                    started = time.perf_counter()
+                    status = await call_asgi(application, method, path, token)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[str(status)] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'throughput_rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'status_codes': dict(statuses),
+        }
+
+
+async def call_asgi(application, method, path, token):
+    """Send one bodiless HTTP request through an ASGI application and return its status."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        # As if behind TLS, since SecurityMiddleware redirects plain HTTP.
+        'scheme': 'https',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'authorization', f'Token {token}'.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 443),
+    }
+    status = None
+    body_sent = False
+    disconnected = asyncio.Event()
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client stays connected until the response is complete.
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            disconnected.set()
+
+    await application(scope, receive, send)
+    return status
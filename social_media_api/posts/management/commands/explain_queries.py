@@ -0,0 +1,111 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from notifications.models import Notification
+from notifications.views import NotificationListView
+from posts.loadgen import generate_social_graph
+from posts.timeline import timeline_entries
+from posts.views import CommentViewSet, PostViewSet
+from social_media_api.pagination import KeysetPagination
+
+User = get_user_model()
+
+# Plan lines that mean "no usable index": a full table scan or an
+# explicit sort step.
+BAD_PLAN_PATTERNS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (?!CONSTANT ROW)\S+$'), "sequential scan"),
+        (re.compile(r'USE TEMP B-TREE'), "temp sort"),
+    ],
+    'postgresql': [
+        (re.compile(r'\bSeq Scan\b'), "sequential scan"),
+        (re.compile(r'(^|->\s+)Sort\b'), "temp sort"),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the query behind each list endpoint against a seeded "
+        "dataset and fail if any of them needs a sequential scan or a sort."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=200,
+                            help="Posts to seed before explaining; rolled back afterwards (default: 200).")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print the full plan of every query.")
+
+    def handle(self, *args, **options):
+        patterns = BAD_PLAN_PATTERNS.get(connection.vendor)
+        if patterns is None:
+            raise CommandError(f"Plan checks are not implemented for {connection.vendor}.")
+
+        failures = []
+        with transaction.atomic():
+            generate_social_graph(users=max(options['seed'] // 10, 2), posts_per_user=10, prefix='explain', seed=0)
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                    # Ask "can this query use an index?" rather than letting a
+                    # tiny seeded table make a sequential scan look cheaper.
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in self.endpoint_querysets():
+                plan = queryset.explain()
+                problems = [
+                    f"{label}: {line.strip()}"
+                    for line in plan.splitlines()
+                    for pattern, label in patterns
+                    if pattern.search(line)
+                ]
+                status = self.style.ERROR("FAIL") if problems else self.style.SUCCESS("ok")
+                self.stdout.write(f"{status} {name}")
+                for problem in problems:
+                    self.stdout.write(f"    {problem}")
+                if options['verbose_plans']:
+                    self.stdout.write(plan)
+                if problems:
+                    failures.append(name)
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"Unindexed query plans for: {', '.join(failures)}")
+
+    def endpoint_querysets(self):
+        """Yield (name, queryset) for the second page of every list endpoint."""
+        reader = User.objects.annotate(entries=Count('timeline_entries')).order_by('-entries').first()
+        recipient = User.objects.annotate(received=Count('notifications')).order_by('-received').first()
+        request = Request(APIRequestFactory().get('/'))
+        request.user = recipient
+
+        for name, view_class in [
+            ('post-list', PostViewSet),
+            ('comment-list', CommentViewSet),
+            ('notification-list', NotificationListView),
+        ]:
+            view = view_class(request=request, action='list', kwargs={}, format_kwarg=None)
+            yield name, self.second_page(view.get_queryset(), KeysetPagination().get_ordering(view))
+
+        yield 'feed', self.second_page(timeline_entries(reader), ('-created_at', '-post_id'))
+        yield 'notification-events', self.second_page(
+            Notification.objects.filter(recipient=recipient), ('-timestamp', '-id')
+        )
+
+    def second_page(self, queryset, ordering):
+        paginator = KeysetPagination()
+        paginator.ordering = ordering
+        queryset = queryset.order_by(*ordering)
+        first_page = list(queryset[:paginator.page_size])
+        if not first_page:
+            return queryset[:paginator.page_size + 1]
+        last = first_page[-1]
+        position = [getattr(last, field.lstrip('-')) for field in ordering]
+        return queryset.filter(paginator.get_keyset_filter(position))[:paginator.page_size + 1]
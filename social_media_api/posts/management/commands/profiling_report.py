@@ -0,0 +1,24 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from social_media_api.profiling import collect_report
+
+
+class Command(BaseCommand):
+    help = (
+        "Dump the per-endpoint timings, query counts and repeated queries recorded "
+        "by ProfilingMiddleware in every process as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        output = json.dumps(collect_report(), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote report to {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of posts and comments."
+
+    def handle(self, *args, **options):
+        posts = search.reindex(Post)
+        comments = search.reindex(Comment)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {posts} post(s) and {comments} comment(s)."))
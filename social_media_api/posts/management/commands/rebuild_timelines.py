@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines from the current follow graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only rebuild the timeline of this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+
+        count = 0
+        for user in users.iterator():
+            rebuild_timeline(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} timeline(s)."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from posts.models import Post
+from posts.response_cache import invalidate_posts
+
+
+class Command(BaseCommand):
+    help = "Repair drift in Post.like_count and Post.comment_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of posts checked per query (default: 1000).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report drifted posts without fixing them.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = repaired = 0
+        last_pk = 0
+
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            drifted = list(
+                Post.objects.filter(pk__in=batch).with_actual_counts()
+                .filter(~Q(like_count=F('actual_like_count')) | ~Q(comment_count=F('actual_comment_count')))
+                .values_list('pk', flat=True)
+            )
+            if drifted and not options['dry_run']:
+                Post.objects.filter(pk__in=drifted).recount()
+                invalidate_posts(drifted)
+            repaired += len(drifted)
+
+        verb = "Found" if options['dry_run'] else "Repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} post(s). {verb} {repaired} with drifted counters."))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.loadgen import generate_social_graph
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic social graph with power-law popularity for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Accounts to create (default: 1000).")
+        parser.add_argument('--posts-per-user', type=int, default=10, help="Average posts per account (default: 10).")
+        parser.add_argument('--follows-per-user', type=int, default=20, help="Average follows per account (default: 20).")
+        parser.add_argument('--likes-per-post', type=int, default=5, help="Average likes per post (default: 5).")
+        parser.add_argument('--comments-per-post', type=int, default=1, help="Average comments per post (default: 1).")
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help="Pareto shape of the popularity distribution; lower is more skewed (default: 1.2).")
+        parser.add_argument('--prefix', default='load', help="Username prefix for generated accounts (default: load).")
+        parser.add_argument('--seed', type=int, default=None, help="Random seed for a reproducible graph.")
+        parser.add_argument('--no-notifications', action='store_true', help="Skip generating like notifications.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = generate_social_graph(
+            users=options['users'],
+            posts_per_user=options['posts_per_user'],
+            follows_per_user=options['follows_per_user'],
+            likes_per_post=options['likes_per_post'],
+            comments_per_post=options['comments_per_post'],
+            alpha=options['alpha'],
+            prefix=options['prefix'],
+            seed=options['seed'],
+            notifications=not options['no_notifications'],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+        rows = sum(vars(stats).values())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)."))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE posts_post_search USING fts5(title, content, tokenize='porter unicode61')",
+    "CREATE VIRTUAL TABLE posts_comment_search USING fts5(content, tokenize='porter unicode61')",
+    "INSERT INTO posts_post_search (rowid, title, content) SELECT id, title, content FROM posts_post",
+    "INSERT INTO posts_comment_search (rowid, content) SELECT id, content FROM posts_comment",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE TABLE posts_post_search ("
+    "object_id bigint PRIMARY KEY REFERENCES posts_post (id) ON DELETE CASCADE, document tsvector NOT NULL)",
+    "CREATE INDEX posts_post_search_document_idx ON posts_post_search USING GIN (document)",
+    "CREATE TABLE posts_comment_search ("
+    "object_id bigint PRIMARY KEY REFERENCES posts_comment (id) ON DELETE CASCADE, document tsvector NOT NULL)",
+    "CREATE INDEX posts_comment_search_document_idx ON posts_comment_search USING GIN (document)",
+    "INSERT INTO posts_post_search (object_id, document) SELECT id, "
+    "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', content), 'B') FROM posts_post",
+    "INSERT INTO posts_comment_search (object_id, document) SELECT id, "
+    "setweight(to_tsvector('english', content), 'B') FROM posts_comment",
+]
+
+BACKWARD = [
+    "DROP TABLE IF EXISTS posts_comment_search",
+    "DROP TABLE IF EXISTS posts_post_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        for statement in BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_fanned_out(apps, schema_editor):
+    # Until now posts were pushed when their author was at or below the
+    # threshold; assume that still describes the existing ones. Anything
+    # else stays pulled, which is never wrong, only slower.
+    Post = apps.get_model('posts', 'Post')
+    threshold = getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+    Post.objects.filter(author__follower_count__lte=threshold).update(fanned_out=True)
+
+
+def materialize_timelines(apps, schema_editor):
+    # 0003 created the timeline table empty. Push every post marked fanned
+    # out above into its author's followers' timelines, so existing feeds
+    # don't start out empty; the rest are read through the pull path.
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    quote = schema_editor.connection.ops.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(TimelineEntry._meta.db_table)} (user_id, post_id, created_at) "
+            f"SELECT f.from_user_id, p.id, p.created_at FROM {quote(Post._meta.db_table)} p "
+            f"JOIN {quote(User.following.through._meta.db_table)} f ON f.to_user_id = p.author_id "
+            f"WHERE p.fanned_out "
+            # Entries fanned out since 0003 was applied are already there.
+            f"ON CONFLICT (user_id, post_id) DO NOTHING"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_search_index'),
+        ('accounts', '0006_user_follow_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='fanned_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['-created_at', '-id'], name='posts_post_pulled_idx'),
+        ),
+        migrations.RunPython(mark_fanned_out, migrations.RunPython.noop),
+        migrations.RunPython(materialize_timelines, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,84 @@
 from django.db import models
+from django.db.models.functions import Coalesce, RowNumber
 from django.conf import settings
 
 User = settings.AUTH_USER_MODEL 
 
 
+def get_comment_preview_size():
+    return getattr(settings, 'POST_COMMENT_PREVIEW_SIZE', 3)
+
+
+def comment_preview(size=None):
+    """
+    Prefetch only the latest ``size`` comments of each post (with their
+    authors) in a single query, using a ROW_NUMBER() window per post.
+    """
+    size = get_comment_preview_size() if size is None else size
+    latest_first = (models.F('created_at').desc(), models.F('id').desc())
+    comments = (
+        Comment.objects.select_related('author')
+        .annotate(preview_rank=models.Window(RowNumber(), partition_by=models.F('post_id'), order_by=latest_first))
+        .filter(preview_rank__lte=size)
+        .order_by(*latest_first)
+    )
+    return models.Prefetch('comments', queryset=comments)
+
+
+class PostQuerySet(models.QuerySet):
+
+    def with_comment_preview(self, size=None):
+        """Posts with their author and a bounded preview of recent comments."""
+        return self.select_related('author').prefetch_related(comment_preview(size))
+
+    def with_comments(self):
+        """Posts with their author and every comment (and comment author)."""
+        comments = Comment.objects.select_related('author').order_by('-created_at', '-id')
+        return self.select_related('author').prefetch_related(models.Prefetch('comments', queryset=comments))
+
+    def with_actual_counts(self):
+        """Annotate the real like/comment counts next to the stored counters."""
+        return self.annotate(actual_like_count=_count_of(Like), actual_comment_count=_count_of(Comment))
+
+    def recount(self):
+        """Reset like_count and comment_count from the Like and Comment tables."""
+        return self.update(like_count=_count_of(Like), comment_count=_count_of(Comment))
+
+
+def _count_of(model):
+    rows = model.objects.filter(post=models.OuterRef('pk')).order_by().values('post')
+    return Coalesce(models.Subquery(rows.annotate(total=models.Count('*')).values('total')), 0)
+
+
 class Post(models.Model):
     title = models.CharField(max_length=150)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(User,related_name='posts' ,on_delete=models.CASCADE)
+    # Denormalized counters, updated with F() expressions alongside the
+    # Like/Comment writes and repaired by `manage.py reconcile_post_counters`.
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Set once the post has been pushed into its followers' timelines
+    # (posts.timeline.fan_out_post). Posts that were not are pulled into
+    # feeds at read time, whatever their author's follower count is now.
+    fanned_out = models.BooleanField(default=False)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Post list and keyset pagination order.
+            models.Index(fields=['-created_at', '-id'], name='posts_post_recent_idx'),
+            # Per-author reads (fan-out-on-read feed, profiles).
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_recent_idx'),
+            # Pulled (not fanned out) posts; only popular authors have any.
+            models.Index(
+                fields=['-created_at', '-id'], condition=models.Q(fanned_out=False), name='posts_post_pulled_idx',
+            ),
+        ]
 
-   
     def __str__(self):
         return self.title
     
@@ -22,7 +89,14 @@ class Comment(models.Model):
     author = models.ForeignKey(User,related_name='comments' ,on_delete=models.CASCADE)
     post = models.ForeignKey(Post,related_name='comments' ,on_delete=models.CASCADE)
 
-   
+    class Meta:
+        indexes = [
+            # Comment list and keyset pagination order.
+            models.Index(fields=['-created_at', '-id'], name='posts_comment_recent_idx'),
+            # Latest comments of a post (comment previews, post detail).
+            models.Index(fields=['post', '-created_at', '-id'], name='posts_comment_post_recent_idx'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.author} on {self.post}'
     
@@ -36,4 +110,24 @@ class Like(models.Model):
         unique_together = ('user', 'post')
 
     def __str__(self):
-        return f'Like by {self.user} on {self.post}'
\ No newline at end of file
+        return f'Like by {self.user} on {self.post}'
+
+
+class TimelineEntry(models.Model):
+    """
+    One row per (follower, post) in a user's materialized home timeline.
+    created_at is copied from the post so the feed can be read straight off
+    the (user, created_at, post) index without touching the posts table.
+    """
+    user = models.ForeignKey(User, related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} in timeline of {self.user}'
@@ -0,0 +1,141 @@
+"""
+Read-through cache for anonymous post list and detail responses.
+
+An entry is stored under the request's URL and representation (renderer
+format and API version) together with the versions of everything it was
+built from: the post list, the post itself and the accounts whose usernames
+appear in it. Writes bump those versions (see posts.signals), so an entry
+is served only while all of them are unchanged and is never stale beyond
+the commit that changed it.
+
+Each entry carries an ETag and Last-Modified, and matching conditional
+requests are answered with 304 without rendering the body.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from social_media_api.conditional import ConditionalGetMixin
+
+# Bump when the serialized shape of posts changes so old entries are ignored.
+REPRESENTATION_VERSION = 1
+
+VERSION_PREFIX = 'response-version:'
+ENTRY_PREFIX = 'response:'
+
+POST_LIST = 'posts'
+
+
+def get_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def author_key(user_id):
+    return f'author:{user_id}'
+
+
+def get_versions(names):
+    """Current version of each name, starting unknown names at a fresh value."""
+    keys = {VERSION_PREFIX + name: name for name in names}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            # A timestamp, so a version evicted from the cache never comes
+            # back with a value that old entries were stored under.
+            cache.add(key, time.time_ns(), None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _bump(names):
+    for name in names:
+        key = VERSION_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def invalidate(*names):
+    """
+    Bump the versions of ``names`` now and again once the current
+    transaction commits, so a response built from data read before the
+    commit cannot be cached under the new version.
+    """
+    _bump(names)
+    transaction.on_commit(lambda: _bump(names))
+
+
+def invalidate_posts(post_ids):
+    invalidate(POST_LIST, *(post_key(post_id) for post_id in post_ids))
+
+
+def _author_ids(posts):
+    ids = set()
+    for post in posts:
+        ids.add(post['author'])
+        ids.update(comment['author'] for comment in post.get('comments', ()))
+    return ids
+
+
+class CachedReadMixin(ConditionalGetMixin):
+    """
+    Serve anonymous list/retrieve requests of a post viewset from the
+    response cache. Authenticated requests get the plain conditional GET of
+    ConditionalGetMixin.
+    """
+
+    def conditional_response(self, request, queryset, view, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().conditional_response(request, queryset, view, *args, **kwargs)
+        if self.action == 'list':
+            names = [POST_LIST]
+        else:
+            names = [post_key(self.kwargs[self.lookup_url_kwarg or self.lookup_field])]
+        return self.cached_response(request, names, view, *args, **kwargs)
+
+    def get_entry_key(self, request):
+        representation = f'{REPRESENTATION_VERSION}|{request.accepted_renderer.format}|{request.version}'
+        digest = hashlib.sha256(f'{representation}|{request.get_full_path()}'.encode()).hexdigest()
+        return ENTRY_PREFIX + digest
+
+    def cached_response(self, request, names, view, *args, **kwargs):
+        key = self.get_entry_key(request)
+        entry = cache.get(key)
+        if entry is None or get_versions(entry['versions']) != entry['versions']:
+            # Read the versions before the data so that a write landing in
+            # between leaves this entry already outdated.
+            versions = get_versions(names)
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            posts = response.data['results'] if 'results' in response.data else [response.data]
+            versions.update(get_versions(author_key(author) for author in _author_ids(posts)))
+            last_modified = int(time.time())
+            if entry is not None:
+                # Never reuse the Last-Modified of the entry this replaces.
+                last_modified = max(last_modified, entry['last_modified'] + 1)
+            etag = hashlib.sha256(repr((key, sorted(versions.items()))).encode()).hexdigest()
+            entry = {'data': response.data, 'versions': versions, 'etag': f'"{etag}"', 'last_modified': last_modified}
+            cache.set(key, entry, get_timeout())
+        else:
+            response = Response(entry['data'])
+
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        # Shared caches may store the body but must revalidate it every time.
+        patch_cache_control(response, public=True, no_cache=True)
+        return get_conditional_response(
+            request._request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+        )
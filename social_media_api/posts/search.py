@@ -0,0 +1,190 @@
+"""
+Full-text search over posts and comments.
+
+Each searchable model has a companion inverted index keyed by the row's
+primary key: an FTS5 virtual table on SQLite and a tsvector column behind a
+GIN index on PostgreSQL (both created by migration 0006). Rows are copied
+into the index from post_save/post_delete (see posts.signals), and bulk
+writes that skip signals call ``reindex`` themselves.
+
+Results are ranked (bm25 / ts_rank_cd) and returned as ``SearchHit``s
+ordered by (search_rank, id) ascending, best match first, so they can be
+paged with the same keyset cursors as the other list endpoints.
+"""
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import NotSupportedError, connection
+
+from .models import Comment, Post
+
+SearchHit = namedtuple('SearchHit', ['id', 'search_rank'])
+
+# Index table and indexed columns (with their rank weight) per model.
+INDEXES = {
+    Post: ('posts_post_search', (('title', 'A'), ('content', 'B'))),
+    Comment: ('posts_comment_search', (('content', 'B'),)),
+}
+
+# bm25() weight of a column for each tsvector weight label.
+SQLITE_WEIGHTS = {'A': 10.0, 'B': 1.0}
+
+REINDEX_BATCH_SIZE = 500
+
+
+def get_text_config():
+    return getattr(settings, 'SEARCH_TEXT_CONFIG', 'english')
+
+
+def search_terms(query):
+    """Split free text into the words that every result must contain."""
+    return re.findall(r'\w+', query.lower())
+
+
+class SQLiteBackend:
+
+    def index(self, cursor, table, source, columns, ids):
+        names = ', '.join(name for name, _ in columns)
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", ids)
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, {names}) SELECT id, {names} FROM {source} WHERE id IN ({placeholders})",
+            ids,
+        )
+
+    def remove(self, cursor, table, ids):
+        placeholders = ', '.join(['%s'] * len(ids))
+        cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", ids)
+
+    def search(self, cursor, table, columns, terms, after, limit):
+        # Quoted terms are matched literally (no FTS5 operators) but still stemmed.
+        match = ' '.join(f'"{term}"' for term in terms)
+        weights = ', '.join(str(SQLITE_WEIGHTS[weight]) for _, weight in columns)
+        params = [match]
+        where = ''
+        if after is not None:
+            where = 'WHERE search_rank > %s OR (search_rank = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        cursor.execute(
+            f"SELECT id, search_rank FROM ("
+            f"SELECT rowid AS id, bm25({table}, {weights}) AS search_rank FROM {table} WHERE {table} MATCH %s"
+            f") {where} ORDER BY search_rank, id LIMIT %s",
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+class PostgreSQLBackend:
+
+    def document(self, columns):
+        return ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, coalesce({name}, '')), '{weight}')" for name, weight in columns
+        )
+
+    def index(self, cursor, table, source, columns, ids):
+        config = get_text_config()
+        cursor.execute(
+            f"INSERT INTO {table} (object_id, document) "
+            f"SELECT id, {self.document(columns)} FROM {source} WHERE id = ANY(%s) "
+            f"ON CONFLICT (object_id) DO UPDATE SET document = EXCLUDED.document",
+            [config] * len(columns) + [list(ids)],
+        )
+
+    def remove(self, cursor, table, ids):
+        cursor.execute(f"DELETE FROM {table} WHERE object_id = ANY(%s)", [list(ids)])
+
+    def search(self, cursor, table, columns, terms, after, limit):
+        # Ranks are negated so that, as on SQLite, lower is better.
+        params = [get_text_config(), ' & '.join(terms)]
+        where = ''
+        if after is not None:
+            where = 'WHERE search_rank > %s OR (search_rank = %s AND id > %s)'
+            params += [after[0], after[0], after[1]]
+        cursor.execute(
+            f"SELECT id, search_rank FROM ("
+            f"SELECT object_id AS id, -ts_rank_cd(document, query) AS search_rank "
+            f"FROM {table}, to_tsquery(%s::regconfig, %s) query WHERE document @@ query"
+            f") hits {where} ORDER BY search_rank, id LIMIT %s",
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend(),
+    'postgresql': PostgreSQLBackend(),
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor)
+
+
+def _batched(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+        yield ids[start:start + REINDEX_BATCH_SIZE]
+
+
+def index(model, ids):
+    """Add or refresh the index rows of the given primary keys."""
+    backend = get_backend()
+    if backend is None:
+        return
+    table, columns = INDEXES[model]
+    source = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        for batch in _batched(ids):
+            backend.index(cursor, table, source, columns, batch)
+
+
+def remove(model, ids):
+    """Drop the index rows of deleted primary keys."""
+    backend = get_backend()
+    if backend is None:
+        return
+    table, _ = INDEXES[model]
+    with connection.cursor() as cursor:
+        for batch in _batched(ids):
+            backend.remove(cursor, table, batch)
+
+
+def reindex(model, queryset=None):
+    """
+    Rebuild the index rows of ``queryset``, one primary key range at a
+    time. Without a queryset the whole index of ``model`` is dropped and
+    rebuilt, which also clears out rows of deleted objects.
+    """
+    if queryset is None:
+        queryset = model.objects.all()
+        if get_backend() is not None:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {INDEXES[model][0]}")
+    queryset = queryset.order_by('pk')
+    count = last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:REINDEX_BATCH_SIZE])
+        if not batch:
+            return count
+        index(model, batch)
+        count += len(batch)
+        last_pk = batch[-1]
+
+
+def search(model, query, after=None, limit=20):
+    """
+    Return up to ``limit`` SearchHits for rows of ``model`` containing every
+    word of ``query``, best match first, starting after the
+    (search_rank, id) position ``after``.
+    """
+    backend = get_backend()
+    if backend is None:
+        raise NotSupportedError(f"Full-text search is not available on {connection.vendor}.")
+    terms = search_terms(query)
+    if not terms:
+        return []
+    table, columns = INDEXES[model]
+    with connection.cursor() as cursor:
+        rows = backend.search(cursor, table, columns, terms, after, limit)
+    return [SearchHit(*row) for row in rows]
@@ -14,6 +14,14 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'post', 'author', 'author_username', 'content', 'created_at', 'updated_at']
         read_only_fields = ['author', 'created_at', 'updated_at']
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # A comment stays on its post: moving it would leave both posts'
+            # comment_count wrong.
+            fields['post'].read_only = True
+        return fields
+
     def create(self, validated_data):
         # Set author from request user
         request = self.context.get('request')
@@ -29,8 +37,9 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = ['id', 'title', 'content', 'author', 'author_username', 'created_at', 'updated_at', 'comments']
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'content', 'author', 'author_username', 'created_at', 'updated_at',
+                  'like_count', 'comment_count', 'comments']
+        read_only_fields = ['author', 'created_at', 'updated_at', 'like_count', 'comment_count']
 
     def create(self, validated_data):
         # Set author from request user
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_finished
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .like_buffer import like_buffer
+from .models import Comment, Like, Post
+from .response_cache import author_key, invalidate, invalidate_posts
+from .timeline import backfill_timeline, prune_timeline
+
+User = get_user_model()
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def sync_timeline_on_follow(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep materialized timelines in step with follow/unfollow."""
+    if action == 'pre_clear':
+        # pk_set is not provided on clear, so remember who is affected.
+        related = instance.followers_set if reverse else instance.following
+        instance._timeline_cleared_ids = set(related.values_list('id', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_timeline_cleared_ids', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if not pk_set:
+        return
+
+    sync = backfill_timeline if action == 'post_add' else prune_timeline
+    if reverse:
+        # instance gained/lost followers: update each follower's timeline.
+        for follower in User.objects.filter(pk__in=pk_set):
+            sync(follower, [instance.pk])
+    else:
+        sync(instance, pk_set)
+
+
+@receiver(request_finished)
+def flush_like_buffer(sender, **kwargs):
+    """Write buffered likes once the response has been sent."""
+    like_buffer.flush_if_due()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Reindex a post or comment whenever its text may have changed."""
+    _, columns = search.INDEXES[sender]
+    if update_fields is not None and not update_fields.intersection(name for name, _ in columns):
+        return
+    search.index(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove(sender, [instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_cached_post(sender, instance, **kwargs):
+    invalidate_posts([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_cached_parent_post(sender, instance, **kwargs):
+    """Comments and likes change the comments and counters of their post."""
+    invalidate_posts([instance.post_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_author(sender, instance, update_fields=None, **kwargs):
+    """Cached posts and comments show their author's username."""
+    if update_fields is None or 'username' in update_fields:
+        invalidate(author_key(instance.pk))
@@ -1,3 +1,735 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from notifications.models import NotificationOutbox
+from social_media_api.nplusone import DuplicateQueriesError, detect_duplicate_queries, fingerprint
+from social_media_api.profiling import RequestProfile, profiler
+from social_media_api.throttling import rejection_report
+
+from .models import Comment, Like, Post, TimelineEntry
+from .like_buffer import like_buffer
+from .timeline import fan_out_post
+from .views import PostViewSet
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeedTimelineTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.stranger = User.objects.create_user(username="stranger", email="stranger@example.com", password="password123")
+        self.reader.following.add(self.author)
+
+        self.feed_url = reverse("feed")
+        self.posts_url = reverse("post-list")
+
+    def authenticate(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.authenticate(self.author)
+        response = self.client.post(self.posts_url, {"title": "Hello", "content": "First post"})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post_id=response.data["id"]).exists())
+        self.assertFalse(TimelineEntry.objects.filter(user=self.stranger).exists())
+
+    def test_feed_lists_followed_posts_newest_first(self):
+        self.authenticate(self.author)
+        self.client.post(self.posts_url, {"title": "Older", "content": "..."})
+        self.client.post(self.posts_url, {"title": "Newer", "content": "..."})
+        Post.objects.create(title="Not followed", content="...", author=self.stranger)
+
+        self.authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post["title"] for post in response.data["results"]], ["Newer", "Older"])
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        post = Post.objects.create(title="Stranger post", content="...", author=self.stranger, fanned_out=True)
+
+        self.reader.following.add(self.stranger)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+        self.reader.following.remove(self.stranger)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader, post=post).exists())
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=0)
+    def test_popular_authors_are_merged_at_read_time(self):
+        self.authenticate(self.author)
+        self.client.post(self.posts_url, {"title": "Pulled", "content": "..."})
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        self.authenticate(self.reader)
+        response = self.client.get(self.feed_url)
+
+        self.assertEqual([post["title"] for post in response.data["results"]], ["Pulled"])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=1)
+    def test_posts_stay_in_feeds_when_author_crosses_threshold(self):
+        self.stranger.following.add(self.author)
+        self.authenticate(self.author)
+        self.client.post(self.posts_url, {"title": "While popular", "content": "..."})
+        self.stranger.following.remove(self.author)
+        self.client.post(self.posts_url, {"title": "After", "content": "..."})
+        self.stranger.following.add(self.author)
+
+        # Pulled and pushed posts alike, for old and new followers.
+        for reader in (self.reader, self.stranger):
+            self.authenticate(reader)
+            response = self.client.get(self.feed_url)
+            self.assertEqual([post["title"] for post in response.data["results"]], ["After", "While popular"])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=0)
+    def test_fan_out_uses_live_follower_count(self):
+        post = Post.objects.create(title="Hello", content="...", author=self.author)
+        post.author.follower_count = 0  # as cached before the reader followed
+
+        self.assertEqual(fan_out_post(post), 0)
+        self.assertFalse(Post.objects.get(pk=post.pk).fanned_out)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class KeysetPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.posts = [
+            Post.objects.create(title=f"Post {i}", content="...", author=self.author)
+            for i in range(5)
+        ]
+
+    def test_cursor_walks_posts_without_gaps_or_duplicates(self):
+        url = reverse("post-list") + "?page_size=2"
+        titles = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            titles.extend(post["title"] for post in response.data["results"])
+            url = response.data["next"]
+
+        self.assertEqual(titles, [f"Post {i}" for i in reversed(range(5))])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse("post-list"), {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_feed_is_paginated(self):
+        reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        reader.following.add(self.author)
+        token = Token.objects.create(user=reader)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        first = self.client.get(reverse("feed"), {"page_size": 3})
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(len(first.data["results"]), 3)
+        self.assertEqual(len(second.data["results"]), 2)
+        self.assertIsNone(second.data["next"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POST_COMMENT_PREVIEW_SIZE=2)
+class QueryCountTestCase(APITestCase):
+    """
+    Pins the number of queries each read endpoint issues. The counts must
+    not depend on how many posts, comments or authors are on the page.
+    """
+    EXPECTED_QUERIES = {
+        "post-list": 2,     # posts + authors, comment previews + authors
+        "post-detail": 2,   # post + author, all comments + authors
+        "comment-list": 2,  # ETag aggregate, comments + authors
+        "feed": 4,          # token + user, timeline + posts + authors, pull-authors, comment previews
+    }
+
+    def setUp(self):
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.token = Token.objects.create(user=self.reader)
+
+    def create_posts(self, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f"author{i}", email=f"author{i}@example.com")
+            self.reader.following.add(author)
+            post = Post.objects.create(title=f"Post {i}", content="...", author=author)
+            for j in range(3):
+                commenter = User.objects.create_user(username=f"commenter{i}-{j}", email=f"commenter{i}-{j}@example.com")
+                Comment.objects.create(content="...", author=commenter, post=post)
+            fan_out_post(post)
+        return post
+
+    def assertEndpointQueries(self, name, url, authenticated=False):
+        if authenticated:
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        with self.assertNumQueries(self.EXPECTED_QUERIES[name]):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_post_list_queries_do_not_grow_with_page(self):
+        self.create_posts(5)
+        response = self.assertEndpointQueries("post-list", reverse("post-list"))
+
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertTrue(all(len(post["comments"]) == 2 for post in response.data["results"]))
+
+    def test_post_detail_queries(self):
+        post = self.create_posts(1)
+        response = self.assertEndpointQueries("post-detail", reverse("post-detail", args=[post.pk]))
+
+        self.assertEqual(len(response.data["comments"]), 3)
+
+    def test_comment_list_queries(self):
+        self.create_posts(3)
+        self.assertEndpointQueries("comment-list", reverse("comment-list"))
+
+    def test_feed_queries_do_not_grow_with_page(self):
+        self.create_posts(5)
+        response = self.assertEndpointQueries("feed", reverse("feed"), authenticated=True)
+
+        self.assertEqual(len(response.data["results"]), 5)
+        self.assertTrue(all(len(post["comments"]) == 2 for post in response.data["results"]))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostCounterTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.fan = User.objects.create_user(username="fan", email="fan@example.com", password="password123")
+        self.post = Post.objects.create(title="Counted", content="...", author=self.author)
+        token = Token.objects.create(user=self.fan)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_like_and_unlike_update_like_count(self):
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+
+        self.client.post(reverse("unlike-post", args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_comment_create_and_delete_update_comment_count(self):
+        response = self.client.post(reverse("comment-list"), {"post": self.post.pk, "content": "Nice"})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+        self.client.delete(reverse("comment-detail", args=[response.data["id"]]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_comment_cannot_be_moved_to_another_post(self):
+        other = Post.objects.create(title="Other", content="...", author=self.author)
+        response = self.client.post(reverse("comment-list"), {"post": self.post.pk, "content": "Nice"})
+
+        response = self.client.patch(reverse("comment-detail", args=[response.data["id"]]), {"post": other.pk, "content": "Edited"})
+
+        self.assertEqual(response.data["post"], self.post.pk)
+        self.assertEqual(response.data["content"], "Edited")
+        self.assertEqual(Post.objects.get(pk=self.post.pk).comment_count, 1)
+        self.assertEqual(Post.objects.get(pk=other.pk).comment_count, 0)
+
+    def test_counts_are_serialized(self):
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        response = self.client.get(reverse("post-detail", args=[self.post.pk]))
+
+        self.assertEqual(response.data["like_count"], 1)
+        self.assertEqual(response.data["comment_count"], 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+
+        out = StringIO()
+        call_command("reconcile_post_counters", stdout=out)
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+        self.assertIn("Repaired 1", out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, LIKE_BUFFER_HOT_THRESHOLD=0, LIKE_BUFFER_FLUSH_INTERVAL=3600)
+class LikeBufferTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.fan = User.objects.create_user(username="fan", email="fan@example.com", password="password123")
+        self.post = Post.objects.create(title="Viral", content="...", author=self.author)
+        token = Token.objects.create(user=self.fan)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        self.addCleanup(like_buffer.flush)
+
+    def test_hot_post_likes_are_buffered_until_flush(self):
+        response = self.client.post(reverse("like-post", args=[self.post.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Like.objects.exists())
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertTrue(Like.objects.filter(user=self.fan, post=self.post).exists())
+        self.assertTrue(NotificationOutbox.objects.filter(recipient=self.author, actor=self.fan, verb="liked").exists())
+
+    def test_pending_like_is_visible_to_the_liker(self):
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        duplicate = self.client.post(reverse("like-post", args=[self.post.pk]))
+        self.assertEqual(duplicate.status_code, status.HTTP_400_BAD_REQUEST)
+
+        unlike = self.client.post(reverse("unlike-post", args=[self.post.pk]))
+        self.assertEqual(unlike.status_code, status.HTTP_200_OK)
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_concurrently_queued_like_counts_as_duplicate(self):
+        # Another request queued the same like after this one checked the table.
+        with mock.patch.object(like_buffer, "add", return_value=False):
+            response = self.client.post(reverse("like-post", args=[self.post.pk]))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "You already liked this post"})
+
+    def test_flush_skips_likes_that_already_exist(self):
+        Like.objects.create(user=self.fan, post=self.post)
+        like_buffer.add(self.fan.pk, self.post.pk)
+
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertEqual(Like.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_flush_skips_deleted_users(self):
+        gone = User.objects.create_user(username="gone", email="gone@example.com")
+        like_buffer.add(gone.pk, self.post.pk)
+        like_buffer.add(self.fan.pk, self.post.pk)
+        gone.delete()
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertEqual(list(Like.objects.values_list("user_id", flat=True)), [self.fan.pk])
+
+    def test_failed_flush_keeps_pending_likes(self):
+        like_buffer.add(self.fan.pk, self.post.pk)
+        with mock.patch("posts.like_buffer.enqueue_many", side_effect=RuntimeError("outbox down")):
+            with self.assertRaises(RuntimeError):
+                like_buffer.flush()
+
+        self.assertFalse(Like.objects.exists())
+        self.assertTrue(like_buffer.is_pending(self.fan.pk, self.post.pk))
+        self.assertEqual(like_buffer.flush(), 1)
+
+
+class ExplainQueriesCommandTestCase(APITestCase):
+
+    def test_list_endpoints_use_indexes(self):
+        out = StringIO()
+        call_command("explain_queries", "--seed", "50", stdout=out)
+
+        self.assertNotIn("FAIL", out.getvalue())
+        self.assertFalse(Post.objects.exists())
+
+
+class LoadGenerationTestCase(APITestCase):
+
+    def test_seed_and_benchmark_report_json(self):
+        call_command("seed_social_graph", "--users", "30", "--posts-per-user", "3", "--seed", "1", stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 90)
+        self.assertTrue(TimelineEntry.objects.exists())
+
+        out = StringIO()
+        call_command("benchmark_api", "--requests", "5", "--warmup", "1", "--seed", "1", stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report["endpoints"]), {"feed", "post-list", "like", "notification-list"})
+        feed = report["endpoints"]["feed"]
+        self.assertEqual(feed["status_codes"], {"200": 5})
+        self.assertLessEqual(feed["p50_ms"], feed["p99_ms"])
+        self.assertEqual(feed["queries"]["max"], QueryCountTestCase.EXPECTED_QUERIES["feed"])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SearchTestCase(APITestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.search_url = reverse("post-search")
+
+    def test_ranks_title_matches_first_and_follows_edits(self):
+        body = Post.objects.create(title="Weekend", content="Went hiking in the mountains", author=self.author)
+        title = Post.objects.create(title="Hiking tips", content="Bring water", author=self.author)
+        Post.objects.create(title="Cooking", content="Pasta night", author=self.author)
+
+        response = self.client.get(self.search_url, {"q": "hike"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([post["id"] for post in response.data["results"]], [title.pk, body.pk])
+
+        title.content = "Bring water and snacks"
+        title.title = "Packing list"
+        title.save()
+        body.delete()
+        response = self.client.get(self.search_url, {"q": "hiking"})
+        self.assertEqual(response.data["results"], [])
+
+    def test_pages_with_cursor(self):
+        for i in range(5):
+            Post.objects.create(title=f"Post {i}", content="climbing " * (i + 1), author=self.author)
+
+        seen = []
+        response = self.client.get(self.search_url, {"q": "climbing", "page_size": 2})
+        while True:
+            seen += [post["id"] for post in response.data["results"]]
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(sorted(seen), sorted(Post.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), 5)
+
+    def test_comment_search_and_rebuild(self):
+        post = Post.objects.create(title="Hello", content="...", author=self.author)
+        comment = Comment.objects.create(content="Great photos!", author=self.author, post=post)
+        # bulk_create bypasses the signals, so only a rebuild picks this up.
+        Comment.objects.bulk_create([Comment(content="More photos please", author=self.author, post=post)])
+
+        response = self.client.get(reverse("comment-search"), {"q": "photo"})
+        self.assertEqual([c["id"] for c in response.data["results"]], [comment.pk])
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        response = self.client.get(reverse("comment-search"), {"q": "photo"})
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_requires_a_query(self):
+        response = self.client.get(self.search_url, {"q": " ?! "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.fan = User.objects.create_user(username="fan", email="fan@example.com", password="password123")
+        self.post = Post.objects.create(title="Hello", content="...", author=self.author)
+        self.detail_url = reverse("post-detail", args=[self.post.pk])
+        self.list_url = reverse("post-list")
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.data["results"][0]["title"], "Hello")
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.data["id"], self.post.pk)
+
+    def test_writes_invalidate_cached_responses(self):
+        self.client.get(self.list_url)
+        self.client.get(self.detail_url)
+
+        Comment.objects.create(content="Nice", author=self.fan, post=self.post)
+        self.assertEqual(len(self.client.get(self.detail_url).data["comments"]), 1)
+
+        self.client.force_authenticate(self.fan)
+        self.client.post(reverse("like-post", args=[self.post.pk]))
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.list_url).data["results"][0]["like_count"], 1)
+
+        self.fan.username = "superfan"
+        self.fan.save()
+        self.assertEqual(self.client.get(self.detail_url).data["comments"][0]["author_username"], "superfan")
+
+    def test_conditional_requests_get_304(self):
+        response = self.client.get(self.detail_url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.post.title = "Edited"
+        self.post.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["title"], "Edited")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.post = Post.objects.create(title="Hello", content="...", author=self.author)
+        self.comment = Comment.objects.create(content="First", author=self.author, post=self.post)
+        self.client.force_authenticate(self.author)
+
+    def assertRevalidates(self, url, change, queries):
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_post_etag_follows_counters_and_comment_edits(self):
+        detail_url = reverse("post-detail", args=[self.post.pk])
+        self.assertRevalidates(detail_url, lambda: self.client.post(reverse("like-post", args=[self.post.pk])),
+                               queries=2)
+
+        def edit_comment():
+            self.comment.content = "Edited"
+            self.comment.save()
+        self.assertRevalidates(reverse("post-list"), edit_comment, queries=2)
+
+    def test_list_etag_reads_only_the_page(self):
+        older = Post.objects.create(title="Older", content="...", author=self.author)
+        Post.objects.filter(pk=older.pk).update(created_at=self.post.created_at - timedelta(days=1))
+        oldest = Post.objects.create(title="Oldest", content="...", author=self.author)
+        Post.objects.filter(pk=oldest.pk).update(created_at=self.post.created_at - timedelta(days=2))
+        url = reverse("post-list") + "?page_size=1"
+        etag = self.client.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIn("LIMIT 2", queries[0]["sql"])
+
+        # Posts past the page (and the row that tells whether there is a next one) are not part of it.
+        Post.objects.filter(pk=oldest.pk).update(like_count=5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_comment_list_etag_follows_new_comments(self):
+        self.assertRevalidates(
+            reverse("comment-list"),
+            lambda: Comment.objects.create(content="Second", author=self.author, post=self.post),
+            queries=1,
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PROFILING_ENABLED=True)
+class ProfilingTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        profiler.clear()
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com", password="password123",
+                                              is_staff=True)
+        author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        Post.objects.create(title="Hello", content="...", author=author)
+
+    def test_report_breaks_down_requests_per_endpoint(self):
+        self.client.force_authenticate(self.admin)
+        for _ in range(3):
+            self.client.get(reverse("post-list"))
+
+        response = self.client.get(reverse("profiling-report"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        post_list = response.data["endpoints"]["post-list"]
+        self.assertEqual(post_list["requests"], 3)
+        self.assertEqual(post_list["status_codes"], {"200": 3})
+        self.assertEqual(sum(post_list["queries"]["histogram"].values()), 3)
+        self.assertGreater(post_list["serializer_ms"]["max"], 0)
+        self.assertGreater(post_list["render_ms"]["max"], 0)
+        self.assertGreaterEqual(post_list["wall_ms"]["max"], post_list["db_ms"]["max"])
+
+        out = StringIO()
+        call_command("profiling_report", stdout=out)
+        self.assertEqual(json.loads(out.getvalue())["endpoints"]["post-list"]["requests"], 3)
+
+    def test_counts_repeated_queries(self):
+        profile = RequestProfile()
+        with connection.execute_wrapper(profile.record_query):
+            for pk in (1, 1, 2):
+                list(Post.objects.filter(pk=pk))
+        self.assertEqual(profile.queries, 3)
+        self.assertEqual(profile.duplicate_queries, 1)
+        self.assertEqual(list(profile.statements.values()), [3])
+
+    def test_report_is_admin_only(self):
+        self.client.force_authenticate(User.objects.get(username="author"))
+        response = self.client.get(reverse("profiling-report"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DuplicateQueryDetectionTestCase(APITestCase):
+
+    def setUp(self):
+        for i in range(3):
+            author = User.objects.create_user(username=f"author{i}", email=f"author{i}@example.com")
+            Post.objects.create(title=f"Post {i}", content="...", author=author)
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x'"),
+            fingerprint("SELECT  *  FROM t WHERE id IN (%s) AND name = 'y'"),
+        )
+
+    def test_reports_loop_issuing_a_query_per_row(self):
+        with self.assertRaises(DuplicateQueriesError) as raised:
+            with detect_duplicate_queries():
+                [post.author.username for post in Post.objects.all()]
+        self.assertIn("3x at posts/tests.py", str(raised.exception))
+
+        with detect_duplicate_queries():
+            [post.author.username for post in Post.objects.select_related("author")]
+
+    def test_requests_with_n_plus_one_fail_under_the_test_runner(self):
+        with mock.patch.object(PostViewSet, "get_queryset", lambda view: Post.objects.order_by("-created_at")):
+            with self.assertRaises(DuplicateQueriesError):
+                self.client.get(reverse("post-list"))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AsyncEndpointsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username="reader", email="reader@example.com", password="password123")
+        self.author = User.objects.create_user(username="author", email="author@example.com", password="password123")
+        self.reader.following.add(self.author)
+        for i in range(3):
+            post = Post.objects.create(title=f"Post {i}", content="...", author=self.author)
+            Comment.objects.create(content="Nice", author=self.reader, post=post)
+            fan_out_post(post)
+        self.post = post
+        self.headers = {"authorization": f"Token {Token.objects.create(user=self.reader).key}"}
+
+    async def test_feed_matches_sync_feed(self):
+        response = await self.async_client.get(reverse("feed-async"), {"page_size": 2}, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        page = response.json()
+        sync_page = (await self.async_client.get(reverse("feed"), {"page_size": 2}, headers=self.headers)).json()
+        self.assertEqual(page["results"], sync_page["results"])
+
+        response = await self.async_client.get(page["next"], headers=self.headers)
+        self.assertEqual([post["title"] for post in response.json()["results"]], ["Post 0"])
+
+    async def test_like_and_unlike(self):
+        like_url = reverse("like-post-async", args=[self.post.pk])
+        self.assertEqual((await self.async_client.post(like_url, headers=self.headers)).status_code, 200)
+        self.assertEqual((await self.async_client.post(like_url, headers=self.headers)).status_code, 400)
+        self.assertEqual((await Post.objects.aget(pk=self.post.pk)).like_count, 1)
+
+        response = await self.async_client.post(reverse("unlike-post-async", args=[self.post.pk]), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(await Like.objects.filter(post=self.post).aexists())
+
+        response = await self.async_client.post(reverse("like-post-async", args=[0]), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse("feed-async"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+        response = await self.async_client.get(reverse("feed-async"), headers={"authorization": "Token nope"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AsgiBenchmarkTestCase(TransactionTestCase):
+
+    def test_reports_sync_and_async_variants(self):
+        call_command("seed_social_graph", "--users", "20", "--posts-per-user", "2", "--seed", "1", stdout=StringIO())
+
+        out = StringIO()
+        call_command("benchmark_asgi", "--requests", "8", "--concurrency", "4", "--seed", "1", stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(set(report["endpoints"]), {"feed", "notification-list", "like"})
+        for variants in report["endpoints"].values():
+            for variant in ("sync", "async"):
+                self.assertEqual(set(variants[variant]["status_codes"]), {"200"})
+                self.assertGreater(variants[variant]["throughput_rps"], 0)
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"likes": "2/min", "writes": None}},
+)
+class ThrottlingTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username="author", email="author@example.com")
+        self.posts = [Post.objects.create(title=f"Post {i}", content="...", author=self.author) for i in range(4)]
+        self.fans = [User.objects.create_user(username=f"fan{i}", email=f"fan{i}@example.com") for i in range(2)]
+        self.tokens = [Token.objects.create(user=fan).key for fan in self.fans]
+
+    def like(self, post, fan=0):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.tokens[fan]}")
+        return self.client.post(reverse("like-post", args=[post.pk]))
+
+    def test_bucket_empties_and_rejects(self):
+        self.assertEqual(self.like(self.posts[0]).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.like(self.posts[1]).status_code, status.HTTP_200_OK)
+        response = self.like(self.posts[2])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # One token refills every 30 seconds.
+        self.assertIn(response["Retry-After"], {"29", "30"})
+        self.assertFalse(Like.objects.filter(post=self.posts[2]).exists())
+
+        # Other users have their own bucket, and reads are not throttled.
+        self.assertEqual(self.like(self.posts[2], fan=1).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("post-list")).status_code, status.HTTP_200_OK)
+        self.assertEqual(rejection_report()["likes"], {"rate": "2/min", "rejected": 1})
+
+    def test_bucket_refills(self):
+        with mock.patch("social_media_api.throttling.time.time", return_value=1000.0):
+            self.like(self.posts[0])
+            self.like(self.posts[1])
+            self.assertEqual(self.like(self.posts[2]).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with mock.patch("social_media_api.throttling.time.time", return_value=1030.0):
+            self.assertEqual(self.like(self.posts[2]).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.like(self.posts[3]).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {"register": "1/hour"}})
+    def test_anonymous_clients_cannot_spoof_their_address(self):
+        for i, address in enumerate(["10.0.0.1", "10.0.0.2"]):
+            response = self.client.post(
+                reverse("register"), {"username": f"new{i}", "email": f"new{i}@example.com", "password": "pass12345"},
+                HTTP_X_FORWARDED_FOR=address,
+            )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    async def test_async_views_share_the_bucket(self):
+        headers = {"authorization": f"Token {self.tokens[0]}"}
+        for post in self.posts[:2]:
+            await self.async_client.post(reverse("like-post", args=[post.pk]), headers=headers)
+        response = await self.async_client.post(reverse("like-post-async", args=[self.posts[2].pk]), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
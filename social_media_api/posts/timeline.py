@@ -0,0 +1,150 @@
+"""
+Materialized home timelines (fan-out-on-write).
+
+When a post is created it is pushed into the TimelineEntry rows of every
+follower of its author, so reading a feed is a single range scan over the
+reader's own entries. Posts by authors with more followers than
+FEED_FANOUT_FOLLOWER_THRESHOLD are not fanned out; they are pulled at read
+time instead (fan-out-on-read) and merged into the timeline.
+
+The decision is recorded per post in Post.fanned_out, so a post stays in
+feeds when its author later crosses the threshold in either direction.
+"""
+from heapq import merge
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Post, TimelineEntry
+
+User = get_user_model()
+
+FANOUT_BATCH_SIZE = 1000
+
+
+def get_fanout_threshold():
+    return getattr(settings, 'FEED_FANOUT_FOLLOWER_THRESHOLD', 5000)
+
+
+def get_backfill_size():
+    return getattr(settings, 'FEED_BACKFILL_POSTS', 100)
+
+
+def fan_out_post(post):
+    """
+    Push a newly created post into the timelines of the author's followers,
+    unless the author has too many of them to push to.
+    """
+    # post.author may come from the authentication cache; use the live count.
+    follower_count = User.objects.filter(pk=post.author_id).values_list('follower_count', flat=True).get()
+    if follower_count > get_fanout_threshold():
+        return 0
+
+    # Marked first: a follow landing during the fan-out then backfills this
+    # post itself instead of missing it (duplicate entries are ignored).
+    Post.objects.filter(pk=post.pk).update(fanned_out=True)
+    post.fanned_out = True
+    follower_ids = User.objects.filter(following=post.author_id).values_list('id', flat=True).iterator(
+        chunk_size=FANOUT_BATCH_SIZE,
+    )
+    entries = [
+        TimelineEntry(user_id=follower_id, post=post, created_at=post.created_at)
+        for follower_id in follower_ids
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+    return len(entries)
+
+
+def backfill_timeline(user, author_ids):
+    """Copy the latest fanned-out posts of newly followed authors into a user's timeline."""
+    latest_first = (F('created_at').desc(), F('id').desc())
+    recent = (
+        Post.objects.filter(author_id__in=list(author_ids), fanned_out=True)
+        .annotate(rank=Window(RowNumber(), partition_by=F('author_id'), order_by=latest_first))
+        .filter(rank__lte=get_backfill_size())
+        .values_list('id', 'created_at')
+    )
+    entries = [
+        TimelineEntry(user_id=user.pk, post_id=post_id, created_at=created_at)
+        for post_id, created_at in recent
+    ]
+    TimelineEntry.objects.bulk_create(entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def prune_timeline(user, author_ids):
+    """Remove posts by unfollowed authors from a user's timeline."""
+    TimelineEntry.objects.filter(user=user, post__author_id__in=author_ids).delete()
+
+
+def _before(position, created_at_field, id_field):
+    created_at, pk = position
+    return Q(**{f'{created_at_field}__lt': created_at}) | Q(**{created_at_field: created_at, f'{id_field}__lt': pk})
+
+
+def timeline_entries(user):
+    """A user's materialized timeline rows with their posts, newest first."""
+    return TimelineEntry.objects.filter(user=user).select_related('post__author').order_by('-created_at', '-post_id')
+
+
+def _pushed_entries(user, before, limit):
+    entries = timeline_entries(user)
+    if before is not None:
+        entries = entries.filter(_before(before, 'created_at', 'post_id'))
+    if limit is not None:
+        entries = entries[:limit]
+    return entries
+
+
+def _pulled_posts(user, before, limit):
+    """Posts by followed authors that were never fanned out (fan-out-on-read)."""
+    pulled = (
+        Post.objects.filter(fanned_out=False, author__in=user.following.all())
+        .select_related('author').order_by('-created_at', '-id')
+    )
+    if before is not None:
+        pulled = pulled.filter(_before(before, 'created_at', 'id'))
+    if limit is not None:
+        pulled = pulled[:limit]
+    return pulled
+
+
+def _merge(pushed, pulled, limit):
+    posts = []
+    seen = set()
+    for post in merge(pushed, pulled, key=lambda p: (p.created_at, p.id), reverse=True):
+        if post.id not in seen:
+            seen.add(post.id)
+            posts.append(post)
+    return posts[:limit] if limit is not None else posts
+
+
+def home_timeline(user, before=None, limit=None):
+    """
+    Return the posts in a user's home feed, newest first.
+
+    ``before`` is an optional (created_at, id) position; only posts strictly
+    older than it are returned. ``limit`` bounds the number of posts read
+    from each source.
+    """
+    pushed = [entry.post for entry in _pushed_entries(user, before, limit)]
+    pulled = list(_pulled_posts(user, before, limit))
+    if not pulled:
+        return pushed
+    return _merge(pushed, pulled, limit)
+
+
+async def ahome_timeline(user, before=None, limit=None):
+    """home_timeline() with the async ORM, for async views."""
+    pushed = [entry.post async for entry in _pushed_entries(user, before, limit)]
+    pulled = [post async for post in _pulled_posts(user, before, limit)]
+    if not pulled:
+        return pushed
+    return _merge(pushed, pulled, limit)
+
+
+def rebuild_timeline(user):
+    """Recreate a user's timeline from the authors they currently follow."""
+    TimelineEntry.objects.filter(user=user).delete()
+    backfill_timeline(user, user.following.values_list('id', flat=True))
@@ -1,14 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, FeedView, UnlikePostView, LikePostView
+from .views import (PostViewSet, CommentViewSet, FeedView, UnlikePostView, LikePostView,
+                    PostSearchView, CommentSearchView, AsyncFeedView, AsyncLikePostView, AsyncUnlikePostView)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
 router.register(r'comments', CommentViewSet, basename='comment')
 
 urlpatterns = [
+    # Ahead of the router so that 'search' is not taken for a pk.
+    path('posts/search/', PostSearchView.as_view(), name='post-search'),
+    path('comments/search/', CommentSearchView.as_view(), name='comment-search'),
     path('', include(router.urls)),
     path('feed/', FeedView.as_view(), name='feed'),
     path('posts/<int:pk>/like/', LikePostView.as_view(), name='like-post'),
     path('posts/<int:pk>/unlike/', UnlikePostView.as_view(), name='unlike-post'),
+    path('async/feed/', AsyncFeedView.as_view(), name='feed-async'),
+    path('async/posts/<int:pk>/like/', AsyncLikePostView.as_view(), name='like-post-async'),
+    path('async/posts/<int:pk>/unlike/', AsyncUnlikePostView.as_view(), name='unlike-post-async'),
 ]
\ No newline at end of file
@@ -1,12 +1,21 @@
 from rest_framework import viewsets,status, permissions,generics
-from .models import Post, Comment, Like
+from .models import Post, Comment, comment_preview
 from rest_framework.permissions import IsAuthenticated
 from .serializers import PostSerializer, CommentSerializer
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.views import APIView
+from accounts.authentication import CachedTokenAuthentication
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from notifications.models import Notification
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.db import transaction
+from django.db.models import F, Max, aprefetch_related_objects, prefetch_related_objects
+from social_media_api.asyncapi import AsyncAPIView
+from social_media_api.conditional import ConditionalGetMixin
+from social_media_api.pagination import KeysetPagination
+from . import search
+from .likes import like_post, unlike_post
+from .response_cache import CachedReadMixin
+from .timeline import ahome_timeline, fan_out_post, home_timeline
 
 # Custom permission: only author can edit/delete
 class IsAuthorOrReadOnly(permissions.BasePermission):
@@ -24,69 +33,173 @@ class IsAuthorOrReadOnly(permissions.BasePermission):
 
 
 # Post ViewSet
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    throttle_scope = 'posts'
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        # Lists embed a short comment preview; a single post shows them all.
+        if self.action == 'list':
+            return super().get_queryset().with_comment_preview()
+        return super().get_queryset().with_comments()
+
+    # The counters are bumped with update(), which leaves updated_at alone.
+    etag_fields = ('pk', 'updated_at', 'like_count', 'comment_count')
+
+    def get_etag_data(self, queryset):
+        data = super().get_etag_data(queryset)
+        # Comments are embedded in posts, and editing one does not touch its post.
+        comments = Comment.objects.filter(post_id__in=[row[0] for row in data['rows']])
+        data['comments_modified'] = comments.aggregate(modified=Max('updated_at'))['modified']
+        return data
 
     def perform_create(self, serializer):
         # Set the author to the logged-in user
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        fan_out_post(post)
 
 
 # Comment ViewSet
-class CommentViewSet(viewsets.ModelViewSet):
-    queryset = Comment.objects.all().order_by('-created_at')
+class CommentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    throttle_scope = 'comments'
+    queryset = Comment.objects.select_related('author').order_by('-created_at')
     serializer_class = CommentSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = KeysetPagination
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            Post.objects.filter(pk=comment.post_id).update(comment_count=F('comment_count') + 1)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
 
-class FeedView(APIView):
+class FeedView(generics.GenericAPIView):
+    serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+    pagination_class = KeysetPagination
+
     def get(self, request):
-         following_users = request.user.following.all() 
-         posts = Post.objects.filter(author__in=following_users).order_by('-created_at')
-         
-         serializer = PostSerializer(posts, many=True)
-         return Response(serializer.data)
+        paginator = self.paginator
+        # Read one extra post so the paginator knows whether a next page exists.
+        posts = home_timeline(
+            request.user,
+            before=paginator.get_position(request, Post),
+            limit=paginator.get_page_size(request) + 1,
+        )
+        page = paginator.paginate_results(posts, request)
+        prefetch_related_objects(page, comment_preview())
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
+class SearchView(generics.GenericAPIView):
+    """
+    Ranked full-text search, best match first. ?q=<words> matches rows that
+    contain every word (stemmed); pages are keyset cursors over
+    (search_rank, id), served from the posts.search index.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('search_rank', 'id')
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not search.search_terms(query):
+            return Response({"error": "Provide a search query with ?q="}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = self.paginator
+        paginator.ordering = paginator.get_ordering(self)
+        model = self.get_queryset().model
+        hits = search.search(
+            model,
+            query,
+            after=paginator.get_position(request, model),
+            limit=paginator.get_page_size(request) + 1,
+        )
+        page = paginator.paginate_results(hits, request)
+        objects = self.get_queryset().in_bulk([hit.id for hit in page])
+        # A row deleted since it was matched is simply left out of the page.
+        results = [objects[hit.id] for hit in page if hit.id in objects]
+        serializer = self.get_serializer(results, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class PostSearchView(SearchView):
+    queryset = Post.objects.with_comment_preview()
+    serializer_class = PostSerializer
+
+
+class CommentSearchView(SearchView):
+    queryset = Comment.objects.select_related('author')
+    serializer_class = CommentSerializer
+
+
 class LikePostView(generics.GenericAPIView):
-    authentication_classes = [TokenAuthentication]
+    throttle_scope = 'likes'
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
 
     def post(self, request, pk):
         post = generics.get_object_or_404(Post,pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
-        if not created:
+        if not like_post(request.user, post):
             return Response({"error": "You already liked this post"}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create notification
-        if post.author != request.user:
-            Notification.objects.create(
-                recipient=post.author,
-                actor=request.user,
-                verb="liked",
-                target=post
-            )
-
         return Response({"message": "Post liked successfully"}, status=status.HTTP_200_OK)
 
 
 class UnlikePostView(generics.GenericAPIView):
+    throttle_scope = 'likes'
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
         post = generics.get_object_or_404(Post, pk=pk)
-
-        like = Like.objects.filter(user=request.user, post=post).first()
-        if not like:
+        if not unlike_post(request.user, post):
             return Response({"error": "You haven't liked this post yet"}, status=status.HTTP_400_BAD_REQUEST)
-
-        like.delete()
         return Response({"message": "Post unliked successfully"}, status=status.HTTP_200_OK)
-       
\ No newline at end of file
+
+
+class AsyncFeedView(AsyncAPIView):
+    """FeedView read with the async ORM."""
+
+    async def get(self, request):
+        paginator = KeysetPagination()
+        posts = await ahome_timeline(
+            request.user,
+            before=paginator.get_position(request, Post),
+            limit=paginator.get_page_size(request) + 1,
+        )
+        page = paginator.paginate_results(posts, request)
+        await aprefetch_related_objects(page, comment_preview())
+        data = PostSerializer(page, many=True).data
+        return JsonResponse({'next': paginator.get_next_link(), 'results': data})
+
+
+class AsyncLikePostView(AsyncAPIView):
+    """LikePostView for async clients; the write itself runs in a worker thread."""
+    throttle_scope = 'likes'
+
+    async def post(self, request, pk):
+        post = await aget_object_or_404(Post.objects.select_related('author'), pk=pk)
+        if not await sync_to_async(like_post)(request.user, post):
+            return JsonResponse({"error": "You already liked this post"}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({"message": "Post liked successfully"})
+
+
+class AsyncUnlikePostView(AsyncAPIView):
+    throttle_scope = 'likes'
+
+    async def post(self, request, pk):
+        post = await aget_object_or_404(Post, pk=pk)
+        if not await sync_to_async(unlike_post)(request.user, post):
+            return JsonResponse({"error": "You haven't liked this post yet"}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({"message": "Post unliked successfully"})
@@ -0,0 +1,59 @@
+"""
+Native async views for the hottest endpoints.
+
+DRF's APIView is synchronous, so under ASGI every DRF request holds a
+thread for its whole duration. AsyncAPIView is a plain Django async view
+with only the parts of APIView those endpoints need:
+- token authentication through CachedTokenAuthentication.aauthenticate
+- the default throttles, so writes share their token buckets with the sync views
+- DRF-shaped JSON errors
+- the DRF Request wrapper, so that KeysetPagination works unchanged
+Database work goes through the async ORM, or sync_to_async for anything
+that needs a transaction.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from accounts.authentication import CachedTokenAuthentication
+
+
+class AsyncAPIView(View):
+    """Base class for async JSON endpoints that require a token."""
+    authenticator = CachedTokenAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authentication is not cookie based, so there is nothing for CSRF to protect.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            credentials = await self.authenticator.aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request = Request(request)
+            request.user, request.auth = credentials
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404 as exc:
+            return JsonResponse({'detail': str(exc)}, status=404)
+        except exceptions.APIException as exc:
+            response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response.status_code = 401
+                response['WWW-Authenticate'] = self.authenticator.authenticate_header(request)
+            if isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    async def check_throttles(self, request):
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            # Cache clients block; keep them off the event loop.
+            if not await sync_to_async(throttle.allow_request, thread_sensitive=False)(request, self):
+                raise exceptions.Throttled(throttle.wait())
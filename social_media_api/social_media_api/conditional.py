@@ -0,0 +1,61 @@
+"""
+Conditional GET (ETag / If-None-Match) for list and detail endpoints.
+
+The ETag is derived from a few columns (by default the primary key and
+``updated_at``) of exactly the rows the response is built from: for keyset
+paginated lists that is the requested page, read with the paginator's own
+bounded query. A matching request is answered with 304 after one narrow
+query that costs no more than the page itself, and the body is never
+serialized.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETags to ``list`` and ``retrieve``. Views can change what goes into
+    the ETag by setting ``etag_fields`` or overriding ``get_etag_data``.
+    """
+    etag_fields = ('pk', 'updated_at')
+
+    def get_etag_rows(self, queryset):
+        """The rows the response is built from: the current page when keyset paginated."""
+        paginator = self.paginator
+        if paginator is not None and hasattr(paginator, 'get_page_queryset'):
+            return paginator.get_page_queryset(queryset, self.request, view=self)
+        return queryset
+
+    def get_etag_data(self, queryset):
+        """Values that change whenever the representation of ``queryset`` does."""
+        rows = self.get_etag_rows(queryset.prefetch_related(None))
+        return {'rows': list(rows.values_list(*self.etag_fields))}
+
+    def get_etag(self, request, queryset):
+        data = self.get_etag_data(queryset)
+        # The URL covers filters and cursors, the format covers the renderer.
+        key = (request.get_full_path(), request.accepted_renderer.format, request.version, sorted(data.items()))
+        return '"%s"' % hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def conditional_response(self, request, queryset, view, *args, **kwargs):
+        etag = self.get_etag(request, queryset)
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(request, queryset, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(request, queryset, super().retrieve, *args, **kwargs)
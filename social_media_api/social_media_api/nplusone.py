@@ -0,0 +1,142 @@
+"""
+Duplicate-query (N+1) detection.
+
+Every query run inside ``detect_duplicate_queries`` is fingerprinted
+(literals, parameter lists and whitespace normalized away). A fingerprint
+seen more than DUPLICATE_QUERY_THRESHOLD times is reported together with
+the project source line that issued its first repeat, which is usually the
+loop body doing a lookup per row.
+
+DUPLICATE_QUERY_DETECTION selects what happens to a report: 'warn' issues a
+DuplicateQueriesWarning, 'raise' raises DuplicateQueriesError, and None
+turns DuplicateQueryMiddleware off. DuplicateQueryTestRunner runs the test
+suite in 'raise' mode so that a new N+1 fails the test that exercises it.
+
+Each Django project in this repository runs with only itself on the path,
+so this module is deliberately copied, unchanged, into every project that
+uses it: social_media_api/social_media_api, django_blog/django_blog and
+advanced-api-project/advanced_api_project. Keep the copies identical and
+change them together.
+"""
+import re
+import traceback
+import warnings
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Transaction bookkeeping repeats by design.
+IGNORED = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT|ROLLBACK)\b', re.I)
+NORMALIZERS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),                   # string literals
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),                 # numeric literals
+    (re.compile(r'%s'), '?'),                                # placeholders
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),    # IN lists of any length
+    (re.compile(r'\s+'), ' '),
+)
+
+
+class DuplicateQueriesError(AssertionError):
+    pass
+
+
+class DuplicateQueriesWarning(UserWarning):
+    pass
+
+
+def get_mode():
+    return getattr(settings, 'DUPLICATE_QUERY_DETECTION', None)
+
+
+def get_threshold():
+    return getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 2)
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape, so that the same lookup with other values matches."""
+    for pattern, replacement in NORMALIZERS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def origin():
+    """Innermost frame of project code (outside this module) on the current stack."""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        if frame.filename.startswith(base_dir) and frame.filename != __file__ and 'site-packages' not in frame.filename:
+            return f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class DuplicateQueryCollector:
+    """Counts fingerprints and remembers where each one first went over the threshold."""
+
+    def __init__(self, threshold=None):
+        self.threshold = get_threshold() if threshold is None else threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not IGNORED.match(sql):
+            key = fingerprint(sql)
+            self.counts[key] += 1
+            if self.counts[key] == self.threshold + 1:
+                self.origins[key] = origin()
+        return execute(sql, params, many, context)
+
+    @property
+    def duplicates(self):
+        return {key: count for key, count in self.counts.items() if count > self.threshold}
+
+    def report(self, label):
+        lines = [f'{label}: {len(self.duplicates)} query shape(s) ran more than {self.threshold} times']
+        for key, count in sorted(self.duplicates.items(), key=lambda item: -item[1]):
+            lines.append(f'  {count}x at {self.origins[key]}: {key}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect_duplicate_queries(label='block', mode=None, threshold=None):
+    """Collect the queries of every connection and report repeats on exit."""
+    collector = DuplicateQueryCollector(threshold)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(collector))
+        yield collector
+
+    mode = mode or get_mode() or 'raise'
+    if collector.duplicates:
+        if mode == 'raise':
+            raise DuplicateQueriesError(collector.report(label))
+        warnings.warn(collector.report(label), DuplicateQueriesWarning, stacklevel=3)
+
+
+class DuplicateQueryMiddleware:
+    """Check every request for N+1 queries; a no-op unless DUPLICATE_QUERY_DETECTION is set."""
+
+    def __init__(self, get_response):
+        if not get_mode():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with detect_duplicate_queries(f'{request.method} {request.path}'):
+            return self.get_response(request)
+
+
+class DuplicateQueryTestRunner(DiscoverRunner):
+    """Test runner that fails any request issuing N+1 queries."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._detection = override_settings(DUPLICATE_QUERY_DETECTION='raise')
+        self._detection.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._detection.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,149 @@
+"""
+Keyset (seek) pagination shared by the list endpoints.
+
+Pages are addressed by an opaque cursor that encodes the ordering values of
+the last row returned, so fetching page 1000 is the same indexed range scan
+as fetching page 1 — no OFFSET and no COUNT(*).
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination over a unique ordering such as
+    ('-created_at', '-id'). All ordering fields must share one direction and
+    the last one must be unique so that every row has a distinct position.
+
+    Views can override the ordering with a ``keyset_ordering`` attribute.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_results(list(self.get_page_queryset(queryset, request, view)), request)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views, reading the page with the async ORM."""
+        page = self.get_page_queryset(queryset, request, view)
+        return self.paginate_results([row async for row in page], request)
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """The next ``page_size + 1`` rows after the request's cursor."""
+        self.ordering = self.get_ordering(view)
+        position = self.get_position(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+        return queryset[:self.get_page_size(request) + 1]
+
+    def paginate_results(self, results, request):
+        """
+        Trim an already ordered list fetched with ``page_size + 1`` rows and
+        remember where the next page starts.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        page = list(results[:page_size])
+        self.next_position = None
+        if len(results) > page_size:
+            last = page[-1]
+            self.next_position = [getattr(last, field.lstrip('-')) for field in self.ordering]
+        return page
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_position(self, request, model=None):
+        """
+        Decode the cursor query parameter into a list of ordering values,
+        validated against ``model``'s fields when it is given.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        if model is not None:
+            position = [self.clean_value(model, field.lstrip('-'), value) for field, value in zip(self.ordering, position)]
+        return position
+
+    def clean_value(self, model, field_name, value):
+        try:
+            field = model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # An annotation; the database compares it as given.
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, position):
+        data = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in position])
+        return base64.urlsafe_b64encode(data.encode('utf-8')).decode('ascii')
+
+    def get_keyset_filter(self, position):
+        """
+        Build the lexicographic "comes after" condition, e.g. for
+        ('-created_at', '-id'): created_at < c OR (created_at = c AND id < i).
+        """
+        descending = self.ordering[0].startswith('-')
+        fields = [field.lstrip('-') for field in self.ordering]
+        lookup = 'lt' if descending else 'gt'
+
+        condition = Q()
+        for index, field in enumerate(fields):
+            clause = Q(**{f'{field}__{lookup}': position[index]})
+            for previous, value in zip(fields[:index], position[:index]):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        return condition
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_position(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
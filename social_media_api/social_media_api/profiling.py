@@ -0,0 +1,307 @@
+"""
+Opt-in request profiling.
+
+With PROFILING_ENABLED, ProfilingMiddleware records for every request its
+wall time, database time and query count, queries that were repeated, and
+the time spent in serializers (DRF ``.data``) and rendering (response
+renderers and Django templates).
+
+Samples are aggregated per URL name into fixed-bucket histograms, so memory
+does not grow with traffic. Each process publishes its aggregates to the
+shared cache every PROFILING_PUBLISH_INTERVAL seconds. GET /profiling/
+(admins only) and ``manage.py profiling_report`` merge the aggregates of
+every process, next to the requests rejected by each throttle scope.
+"""
+import functools
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .throttling import rejection_report
+
+TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METRICS = {
+    'wall_ms': TIME_BUCKETS_MS,
+    'db_ms': TIME_BUCKETS_MS,
+    'serializer_ms': TIME_BUCKETS_MS,
+    'render_ms': TIME_BUCKETS_MS,
+    'queries': QUERY_BUCKETS,
+}
+# Repeated statements kept per endpoint.
+TOP_REPEATED = 10
+
+PROCESSES_KEY = 'profiling:processes'
+REPORT_TTL = 3600  # seconds a process's aggregates outlive its last publish
+
+_current = ContextVar('profiling_request', default=None)
+
+
+def get_publish_interval():
+    return getattr(settings, 'PROFILING_PUBLISH_INTERVAL', 10)
+
+
+class RequestProfile:
+    """Measurements of a single request."""
+
+    def __init__(self):
+        self.timings = Counter()
+        self.queries = 0
+        self.statements = Counter()
+        self.executions = Counter()
+        self._active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.timings['db_ms'] += (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.statements[sql] += 1
+            self.executions[sql, repr(params)] += 1
+
+    def time_section(self, metric, func, *args, **kwargs):
+        # Only the outermost call is timed, e.g. a ListSerializer and not its children.
+        if metric in self._active:
+            return func(*args, **kwargs)
+        self._active.add(metric)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.timings[metric] += (time.perf_counter() - started) * 1000
+            self._active.discard(metric)
+
+    @property
+    def duplicate_queries(self):
+        """Executions of a statement with parameters already run in this request."""
+        return sum(count - 1 for count in self.executions.values())
+
+
+def _timed(metric, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        return profile.time_section(metric, func, *args, **kwargs)
+    return wrapper
+
+
+_instrumented = False
+
+
+def instrument():
+    """Wrap serializer and rendering entry points once per process."""
+    global _instrumented
+    if _instrumented:
+        return
+    from django.template.base import Template
+    from django.template.response import SimpleTemplateResponse
+    from rest_framework.serializers import ListSerializer, Serializer
+
+    for cls in (Serializer, ListSerializer):
+        cls.data = property(_timed('serializer_ms', cls.data.fget))
+    SimpleTemplateResponse.render = _timed('render_ms', SimpleTemplateResponse.render)
+    Template.render = _timed('render_ms', Template.render)
+    _instrumented = True
+
+
+def new_histogram(bounds):
+    return {'count': 0, 'sum': 0.0, 'max': 0.0, 'buckets': [0] * (len(bounds) + 1)}
+
+
+def new_endpoint():
+    return {
+        'requests': 0,
+        'status_codes': {},
+        'duplicate_queries': 0,
+        'requests_with_duplicates': 0,
+        'repeated_statements': {},
+        'histograms': {metric: new_histogram(bounds) for metric, bounds in METRICS.items()},
+    }
+
+
+def observe(histogram, bounds, value):
+    histogram['count'] += 1
+    histogram['sum'] += value
+    histogram['max'] = max(histogram['max'], value)
+    histogram['buckets'][bisect_left(bounds, value)] += 1
+
+
+def merge_endpoint(into, other):
+    into['requests'] += other['requests']
+    into['duplicate_queries'] += other['duplicate_queries']
+    into['requests_with_duplicates'] += other['requests_with_duplicates']
+    for code, count in other['status_codes'].items():
+        into['status_codes'][code] = into['status_codes'].get(code, 0) + count
+    repeated = Counter(into['repeated_statements'])
+    repeated.update(other['repeated_statements'])
+    into['repeated_statements'] = dict(repeated.most_common(TOP_REPEATED))
+    for metric, histogram in other['histograms'].items():
+        target = into['histograms'][metric]
+        target['count'] += histogram['count']
+        target['sum'] += histogram['sum']
+        target['max'] = max(target['max'], histogram['max'])
+        target['buckets'] = [a + b for a, b in zip(target['buckets'], histogram['buckets'])]
+
+
+def percentile(histogram, bounds, pct):
+    """Upper bound of the bucket holding the pct-th percentile (max for the last)."""
+    if not histogram['count']:
+        return None
+    rank = pct / 100 * histogram['count']
+    seen = 0
+    for index, count in enumerate(histogram['buckets']):
+        seen += count
+        if count and seen >= rank:
+            return bounds[index] if index < len(bounds) else histogram['max']
+    return histogram['max']
+
+
+def summarize(histogram, bounds):
+    labels = [f'<={bound}' for bound in bounds] + [f'>{bounds[-1]}']
+    count = histogram['count']
+    return {
+        'mean': round(histogram['sum'] / count, 3) if count else None,
+        'p50': percentile(histogram, bounds, 50),
+        'p95': percentile(histogram, bounds, 95),
+        'p99': percentile(histogram, bounds, 99),
+        'max': round(histogram['max'], 3),
+        'histogram': dict(zip(labels, histogram['buckets'])),
+    }
+
+
+class Profiler:
+    """Per-process aggregates, keyed by URL name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._last_publish = time.monotonic()
+        self.process_key = f'profiling:process:{socket.gethostname()}:{os.getpid()}'
+
+    def record(self, name, status_code, profile, wall_ms):
+        repeated = {sql: count for sql, count in profile.statements.items() if count > 1}
+        sample = new_endpoint()
+        sample['requests'] = 1
+        sample['status_codes'][str(status_code)] = 1
+        sample['duplicate_queries'] = profile.duplicate_queries
+        sample['requests_with_duplicates'] = int(profile.duplicate_queries > 0)
+        sample['repeated_statements'] = repeated
+        values = dict(profile.timings, wall_ms=wall_ms, queries=profile.queries)
+        for metric, bounds in METRICS.items():
+            observe(sample['histograms'][metric], bounds, values.get(metric, 0))
+        with self._lock:
+            merge_endpoint(self._endpoints.setdefault(name, new_endpoint()), sample)
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for name, data in self._endpoints.items():
+                endpoints[name] = new_endpoint()
+                merge_endpoint(endpoints[name], data)
+            return endpoints
+
+    def clear(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def publish(self):
+        """Store this process's aggregates in the shared cache."""
+        self._last_publish = time.monotonic()
+        endpoints = self.snapshot()
+        if not endpoints:
+            return
+        cache.set(self.process_key, endpoints, REPORT_TTL)
+        processes = cache.get(PROCESSES_KEY) or set()
+        if self.process_key not in processes:
+            cache.set(PROCESSES_KEY, processes | {self.process_key}, None)
+
+    def publish_if_due(self):
+        if time.monotonic() - self._last_publish >= get_publish_interval():
+            self.publish()
+
+
+profiler = Profiler()
+
+
+def collect_report():
+    """Merge the published aggregates of every process into a summary per URL name."""
+    processes = cache.get(PROCESSES_KEY) or set()
+    published = cache.get_many(processes)
+    if len(published) < len(processes):
+        # Forget processes whose aggregates have expired.
+        cache.set(PROCESSES_KEY, set(published), None)
+
+    merged = {}
+    for endpoints in published.values():
+        for name, data in endpoints.items():
+            merge_endpoint(merged.setdefault(name, new_endpoint()), data)
+
+    report = {}
+    for name, data in sorted(merged.items(), key=lambda item: -item[1]['histograms']['wall_ms']['sum']):
+        report[name] = {
+            'requests': data['requests'],
+            'status_codes': data['status_codes'],
+            'duplicate_queries': data['duplicate_queries'],
+            'requests_with_duplicates': data['requests_with_duplicates'],
+            'repeated_statements': data['repeated_statements'],
+            **{metric: summarize(data['histograms'][metric], bounds) for metric, bounds in METRICS.items()},
+        }
+    return {'processes': len(published), 'endpoints': report, 'throttling': rejection_report()}
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+class ProfilingMiddleware:
+    """Profile every request; a no-op unless PROFILING_ENABLED is set."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall_ms = (time.perf_counter() - started) * 1000
+
+        profiler.record(endpoint_name(request), response.status_code, profile, wall_ms)
+        profiler.publish_if_due()
+        return response
+
+
+class ProfilingReportView(APIView):
+    """Per-endpoint profiling summary of every process (admins only)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        profiler.publish()
+        return Response(collect_report())
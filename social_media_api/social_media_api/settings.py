@@ -55,6 +55,9 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    # First, so that its timings cover the rest of the stack.
+    'social_media_api.profiling.ProfilingMiddleware',
+    'social_media_api.nplusone.DuplicateQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -157,3 +160,105 @@ CSRF_COOKIE_SECURE = True
 SECURE_HSTS_SECONDS = 3600  # adjust as needed
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # social_media_api.throttling: token buckets on writes, per user (or client
+    # address) and scope. A bucket holds N requests and refills at N per period;
+    # views without a throttle_scope share 'writes'. None disables a scope.
+    'DEFAULT_THROTTLE_CLASSES': ['social_media_api.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'writes': '120/min',
+        'posts': '30/min',
+        'comments': '60/min',
+        'likes': '120/min',
+        'follows': '60/min',
+        'register': '10/hour',
+        # Full user exports (GET /users/?export=ndjson).
+        'export': '5/hour',
+    },
+    # Anonymous clients are throttled by address. Without this DRF would key
+    # them on the raw X-Forwarded-For header, which any client can change;
+    # set it to the number of trusted proxies in front of the app.
+    'NUM_PROXIES': 0,
+}
+
+# Point this at a shared backend (Redis, Memcached) in production so every
+# worker sees the same cached tokens, versions and counters.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# accounts.authentication.CachedTokenAuthentication
+TOKEN_AUTH_CACHE_TIMEOUT = 300  # seconds in the shared cache
+TOKEN_AUTH_LOCAL_CACHE_SIZE = 10000  # entries in each process's LRU
+TOKEN_AUTH_LOCAL_CACHE_TTL = 5  # seconds; other processes can't evict local entries
+
+# Maximum user ids accepted by the bulk follow/unfollow endpoints.
+BULK_FOLLOW_MAX_USERS = 500
+# Maximum user ids accepted by GET /accounts/relationships/.
+RELATIONSHIP_LOOKUP_MAX_USERS = 100
+
+# accounts.graph: follow changes overlaid on the in-memory snapshot before it
+# is compacted, and seconds before a snapshot is reloaded from the database.
+FOLLOW_GRAPH_MAX_DELTA = 10000
+FOLLOW_GRAPH_MAX_AGE = 300
+
+# Home feed: posts by authors with more followers than this are pulled at
+# read time instead of being copied into every follower's timeline.
+FEED_FANOUT_FOLLOWER_THRESHOLD = 5000
+# Number of recent posts copied into a timeline when following someone.
+FEED_BACKFILL_POSTS = 100
+# Number of latest comments embedded in each post on list and feed pages.
+POST_COMMENT_PREVIEW_SIZE = 3
+
+# Likes on posts with at least this many likes go through the write-behind
+# buffer in posts.like_buffer and are flushed in bulk.
+LIKE_BUFFER_HOT_THRESHOLD = 1000
+LIKE_BUFFER_FLUSH_INTERVAL = 2.0  # seconds
+LIKE_BUFFER_MAX_PENDING = 500
+
+# Outbox events turned into Notification rows per dispatch_notifications transaction.
+NOTIFICATION_DISPATCH_BATCH_SIZE = 500
+# Notifications with the same recipient, verb and post inside one bucket are
+# rolled up into a single inbox entry.
+NOTIFICATION_ROLLUP_BUCKET_SECONDS = 24 * 60 * 60
+# GET /notifications/stream/: each process polls for new notifications every
+# POLL_INTERVAL seconds while clients are connected. Event streams send a
+# heartbeat every HEARTBEAT seconds and close after MAX_SECONDS; long polls
+# wait at most NOTIFICATION_LONGPOLL_TIMEOUT seconds. Ids are re-scanned for
+# GRACE_SECONDS after they first could have been seen, to pick up rows whose
+# transaction commits late; keep it above the longest dispatch transaction.
+NOTIFICATION_STREAM_POLL_INTERVAL = 1.0
+NOTIFICATION_STREAM_GRACE_SECONDS = 10
+NOTIFICATION_STREAM_HEARTBEAT = 15
+NOTIFICATION_STREAM_MAX_SECONDS = 300
+NOTIFICATION_LONGPOLL_TIMEOUT = 25
+# Age in days past which `manage.py prune_notifications` removes notifications.
+NOTIFICATION_RETENTION_DAYS = 90
+
+# PostgreSQL text search configuration used by posts.search (SQLite FTS5 uses
+# the porter stemmer regardless).
+SEARCH_TEXT_CONFIG = 'english'
+
+# Seconds an anonymous post list/detail response stays in posts.response_cache.
+# Writes invalidate entries right away; this bounds memory use and the
+# staleness after raw bulk updates that bypass the signals.
+RESPONSE_CACHE_TIMEOUT = 300
+
+# social_media_api.profiling: per-endpoint timing and query histograms, served
+# at /profiling/ to admins. Off by default; publish interval in seconds.
+PROFILING_ENABLED = False
+PROFILING_PUBLISH_INTERVAL = 10
+
+# social_media_api.nplusone: 'warn' or 'raise' when one request repeats a query
+# shape more than DUPLICATE_QUERY_THRESHOLD times. The test runner always raises.
+DUPLICATE_QUERY_DETECTION = None
+DUPLICATE_QUERY_THRESHOLD = 2
+TEST_RUNNER = 'social_media_api.nplusone.DuplicateQueryTestRunner'
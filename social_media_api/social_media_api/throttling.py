@@ -0,0 +1,108 @@
+"""
+Token-bucket throttling of write requests.
+
+Every (scope, user) pair has a bucket of N tokens, refilled at N per period,
+from the scope's "N/period" rate in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+A write takes a token and is rejected with 429 when the bucket is empty.
+Requests are keyed by user, or by client address when anonymous (trusting
+X-Forwarded-For only as far as REST_FRAMEWORK['NUM_PROXIES']). Views pick
+their scope with ``throttle_scope``; writes to views without one share the
+'writes' scope. Safe methods are only throttled in views whose
+``throttle_reads`` is true.
+
+A bucket is stored as one integer: the time in milliseconds at which it
+will be full again (the theoretical arrival time of the generic cell rate
+algorithm, an equivalent formulation of a token bucket). Taking a token adds
+one token's worth of time with an atomic cache increment and a rejected
+request gives it back with a decrement, so workers sharing the cache never
+overwrite each other's updates.
+
+Rejections are counted per scope in the shared cache and included in the
+profiling report (GET /profiling/, ``manage.py profiling_report``).
+"""
+import time
+
+from django.core.cache import cache
+from rest_framework import permissions
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULT_SCOPE = 'writes'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# A bucket expires this many periods after it was created and starts over
+# full, which bounds the extra burst a client can get to 1/BUCKET_TTL_PERIODS.
+BUCKET_TTL_PERIODS = 10
+REJECTED_KEY = 'throttle:rejected:{}'
+
+
+def parse_rate(rate):
+    """'60/min' -> (60 requests, 60 seconds); None -> None."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+def record_rejection(scope):
+    key = REJECTED_KEY.format(scope)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+class TokenBucketThrottle(BaseThrottle):
+    wait_ms = 0
+
+    def get_scope(self, view):
+        return getattr(view, 'throttle_scope', None) or DEFAULT_SCOPE
+
+    def allow_request(self, request, view):
+        if request.method in permissions.SAFE_METHODS and not getattr(view, 'throttle_reads', False):
+            return True
+        scope = self.get_scope(view)
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(scope))
+        if rate is None:
+            return True
+        capacity, period = rate
+        interval = period * 1000 // capacity  # milliseconds to refill one token
+        user = getattr(request, 'user', None)
+        ident = user.pk if user is not None and user.is_authenticated else self.get_ident(request)
+        key = f'throttle:{scope}:{ident}'
+
+        now = int(time.time() * 1000)
+        try:
+            cache.add(key, now, period * BUCKET_TTL_PERIODS)
+            full_at = cache.incr(key, interval)
+            if full_at - interval < now:
+                # The bucket had refilled completely: count from now, keeping
+                # any tokens other requests took in the meantime.
+                full_at = cache.incr(key, now - (full_at - interval))
+        except ValueError:
+            # The bucket expired between add and incr, so it is full.
+            return True
+        if full_at - now <= capacity * interval:
+            return True
+
+        try:
+            cache.decr(key, interval)
+        except ValueError:
+            pass
+        self.wait_ms = full_at - now - capacity * interval
+        record_rejection(scope)
+        return False
+
+    def wait(self):
+        return self.wait_ms / 1000
+
+
+def rejection_report():
+    """Rate and rejected requests of every scope."""
+    rates = api_settings.DEFAULT_THROTTLE_RATES
+    counts = cache.get_many([REJECTED_KEY.format(scope) for scope in rates])
+    return {
+        scope: {'rate': rate, 'rejected': counts.get(REJECTED_KEY.format(scope), 0)}
+        for scope, rate in sorted(rates.items())
+    }
+
@@ -17,8 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .profiling import ProfilingReportView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('api/', include('posts.urls')),
+    path('notifications/', include('notifications.urls')),
+    path('profiling/', ProfilingReportView.as_view(), name='profiling-report'),
 ]